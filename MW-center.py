@@ -1,61 +1,113 @@
-#%% 
+#%%
 import numpy as np
 import matplotlib.pyplot as plt
-from astropy.coordinates import SkyCoord, EarthLocation, AltAz
+from astropy.coordinates import SkyCoord
 from astropy.time import Time
+import argparse
 import datetime
 import astropy.units as u
-import scienceplots 
+import scienceplots
 plt.style.use(['science', 'no-latex'])
 from matplotlib.collections import LineCollection
 import matplotlib.dates as mdates
 
+from ilofar_obs import LOCATION, altaz_tracks, transit_windows, setup_offline_data
+
 # ------------------------------------
-#          - Set up Observer -
+#          - Set up Arguments -
 # ------------------------------------
 
-longitude = 7.9219 * u.deg
-latitude = 53.0950 * u.deg
-elevation = 72.0 * u.m
-location = EarthLocation.from_geodetic(longitude, latitude, elevation)
+def parse_pointing(text):
+    l, b = text.split(',')
+    return float(l), float(b)
 
+parser = argparse.ArgumentParser(description='Elevation tracks and best observing windows for galactic (l, b) pointings from I-LOFAR')
+parser.add_argument('--pointings', type=parse_pointing, nargs='+', help='Galactic pointings as l,b in degrees (default: Galactic Centre)', default=[(359.944, -0.046)])
+parser.add_argument('--start', help='Start date in form YYYY-MM-DD HH:MM:SS (default: now)', default=None)
+parser.add_argument('--days', type=float, help='Length of the date range in days', default=1)
+parser.add_argument('--cadence', type=float, help='Time between samples in minutes', default=24 * 60 / 99)
+parser.add_argument('--no-plot', action='store_true', help='Only print the window table')
+args = parser.parse_args()
+setup_offline_data()
 
-current_time = Time(datetime.datetime.now())
+current_time = Time(args.start) if args.start else Time(datetime.datetime.now())
 
-# Generate a time range for the next 24 hours
-hours = np.linspace(0, 24, 100)  
-times = current_time + hours * u.hour
+# Generate the time range at the requested cadence
+minutes = np.arange(0, args.days * 24 * 60 + args.cadence / 2, args.cadence)
+times = current_time + minutes * u.min
 utc_times = times.datetime
 
-# Galactic Center coordinates
-galactic_center = SkyCoord(ra=266.4051, dec=-29.0078, unit="deg", frame="icrs")
+# Galactic pointings
+l, b = np.array(args.pointings).T
+pointings = SkyCoord(l=l, b=b, unit="deg", frame="galactic")
+labels = ['l=%g, b=%g' % (lon, lat) for lon, lat in args.pointings]
+
+# (pointing x time) tracks in one transform
+altitudes, azimuths = altaz_tracks(pointings, times, LOCATION)
+
+# ------------------------------------
+#    - Best Window per Transit -
+# ------------------------------------
+# Same rule as altaz-single-target.py: the window spans the 30 deg crossings when the
+# peak is above 30 deg, otherwise the points 10 deg below the peak. Tracks are cut at the
+# altitude minima between transits, so windows spanning midnight are kept whole.
+# '<' / '>' mark windows that are still open at the start / end of the range (or, between
+# transits, that never drop to the threshold), so the real crossing is not shown.
+
+print('Pointing\tDate\t\tMax Alt\tPeak (UTC)\tWindow (UTC)')
+for p in range(len(pointings)):
+    for start, end, peak, rise, set_, threshold in transit_windows(altitudes[p]):
+        date = utc_times[peak].strftime('%Y-%m-%d')
+        if altitudes[p, peak] <= 0:
+            print('%s\t%s\tnot up' % (labels[p], date))
+            continue
 
-altitudes = []
-azimuths = []
+        opens = '<' if rise is None else ''
+        closes = '>' if set_ is None else ''
+        rise = start if rise is None else rise
+        set_ = end - 1 if set_ is None else set_
+        # Peak on the edge of the range: the transit itself is outside it
+        note = '\ttransit outside range' if (peak == 0 or peak == len(utc_times) - 1) else ''
 
-for time in times:
-    altaz_frame = AltAz(obstime=time, location=location)
-    altaz = galactic_center.transform_to(altaz_frame)
-    altitudes.append(altaz.alt.deg)
-    azimuths.append(altaz.az.deg)
+        print('%s\t%s\t%.1f\t%s\t\t%s%s - %s%s%s' % (labels[p], date, altitudes[p, peak], utc_times[peak].strftime('%H:%M'),
+              opens, utc_times[rise].strftime('%H:%M'), utc_times[set_].strftime('%m-%d %H:%M'), closes, note))
+
+if args.no_plot:
+    raise SystemExit
+
+# ------------------------------------
+#        - Plotting Results -
+# ------------------------------------
 
 plt.figure(figsize=(10, 6), dpi=150)
 
-points = np.array([mdates.date2num(utc_times), altitudes]).T.reshape(-1, 1, 2)
-segments = np.concatenate([points[:-1], points[1:]], axis=1)
-norm = plt.Normalize(min(azimuths), max(azimuths))
+# All tracks in one LineCollection, segments never joined across pointings
+points = np.stack([np.broadcast_to(mdates.date2num(utc_times), altitudes.shape), altitudes], axis=-1)
+segments = np.stack([points[:, :-1], points[:, 1:]], axis=2).reshape(-1, 2, 2)
+norm = plt.Normalize(azimuths.min(), azimuths.max())
 lc = LineCollection(segments, cmap='viridis', norm=norm, linewidths=3)
-lc.set_array(np.array(azimuths))
+lc.set_array(azimuths[:, :-1].ravel())
 line = plt.gca().add_collection(lc)
 
+if len(pointings) > 1:
+    for p, peak in enumerate(np.argmax(altitudes, axis=1)):
+        plt.annotate(labels[p], (utc_times[peak], altitudes[p, peak]), textcoords='offset points', xytext=(0, 5), ha='center', fontsize=7)
+
 plt.colorbar(line, label="Azimuth (degrees)")
-plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-plt.gca().xaxis.set_major_locator(mdates.HourLocator(interval=4))
+if args.days <= 1:
+    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+    plt.gca().xaxis.set_major_locator(mdates.HourLocator(interval=4))
+else:
+    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%m-%d'))
+    plt.gca().xaxis.set_major_locator(mdates.AutoDateLocator())
 plt.xlim(utc_times[0], utc_times[-1])
-plt.ylim(min(altitudes) - 5, max(altitudes) + 5)
+plt.ylim(altitudes.min() - 5, altitudes.max() + 5)
 plt.xlabel("Time (UTC)")
 plt.ylabel("Altitude (degrees)")
-plt.title("Galactic Center for next day starting at %s" % current_time.datetime.strftime("%H:%M, %m-%d "))
+if len(pointings) == 1 and args.days <= 1:
+    plt.title("%s for next day starting at %s" % (labels[0], current_time.datetime.strftime("%H:%M, %m-%d ")))
+else:
+    plt.title("%d galactic pointings over %g days starting %s" % (len(pointings), args.days, current_time.datetime.strftime("%Y-%m-%d")))
 plt.grid(True)
 plt.tight_layout()
 plt.show()
@@ -0,0 +1,13 @@
+'''
+I-LOFAR observation planning library: site set-up, catalogue loading, vectorized visibility,
+window finding, avoidance constraints and scheduling. The sky temperature / SEFD calculations
+need the optional pygdsm dependency and live in ilofar_obs.sensitivity, which is not imported here.
+'''
+
+from .observer import LOCATION, make_observer, observation_times
+from .catalogue import BENCHMARKS, load_catalogue, catalogue_from_cube
+from .visibility import altaz_tracks, build_visibility_cube, load_visibility_cube, slice_window
+from .windows import window_thresholds, observing_window, transit_windows, mask_intervals, VisibilityWindows
+from .constraints import ATEAM, DEFAULT_ATEAM, avoidance_components, avoidance_mask, add_constraint_args
+from .scheduling import best_sources, schedule_blocks, schedule_timefmt
+from .offline import setup_offline_data
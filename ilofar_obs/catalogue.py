@@ -0,0 +1,25 @@
+'''
+Code Purpose: Source catalogue loading and the benchmark targets drawn on the sky plots.
+Author: Owen A. Johnson
+'''
+
+import astropy.units as u
+import pandas as pd
+
+from astropy.coordinates import SkyCoord
+
+# - Benchmark Targets -
+BENCHMARKS = {
+    'Polaris': SkyCoord('02h31m49.09s', '+89d15m50.8s', frame='icrs'),
+    'Crab': SkyCoord('05h34m31.93830s', '+22d00m52.1758s', frame='icrs'),
+}
+
+def load_catalogue(path):
+    '''Read a catalogue CSV with Name, RA and DEC (radians) columns, returning the table and its coordinates.'''
+    src_df = pd.read_csv(path)
+    return src_df, SkyCoord(ra=src_df['RA'], dec=src_df['DEC'], unit=(u.rad, u.rad))
+
+def catalogue_from_cube(cube):
+    '''The catalogue a visibility cube was built from, in the same form as load_catalogue.'''
+    src_df = pd.DataFrame({'Name': cube['names'], 'RA': cube['ra_rad'], 'DEC': cube['dec_rad']})
+    return src_df, SkyCoord(ra=src_df['RA'], dec=src_df['DEC'], unit=(u.rad, u.rad))
@@ -0,0 +1,72 @@
+'''
+Code Purpose: Sun, Moon, A-team and altitude avoidance masks, evaluated for every (source, time) slot at once.
+Author: Owen A. Johnson
+'''
+
+import numpy as np
+
+from astropy.coordinates import SkyCoord, get_body, AltAz
+
+# Bright low-frequency sources whose sidelobes spoil nearby pointings
+ATEAM = {
+    'Cas A': SkyCoord('23h23m24.0s', '+58d48m54s', frame='icrs'),
+    'Cyg A': SkyCoord('19h59m28.36s', '+40d44m02.1s', frame='icrs'),
+    'Tau A': SkyCoord('05h34m31.94s', '+22d00m52.2s', frame='icrs'),
+    'Vir A': SkyCoord('12h30m49.42s', '+12d23m28.0s', frame='icrs'),
+}
+DEFAULT_ATEAM = ['Cas A', 'Cyg A']
+
+def angular_separation(alt1, az1, alt2, az2):
+    '''Great-circle separation in degrees between alt/az positions (degrees), broadcasting over arrays.'''
+    alt1, az1, alt2, az2 = map(np.deg2rad, (alt1, az1, alt2, az2))
+    daz = az2 - az1
+    num = np.hypot(np.cos(alt2) * np.sin(daz), np.cos(alt1) * np.sin(alt2) - np.sin(alt1) * np.cos(alt2) * np.cos(daz))
+    den = np.sin(alt1) * np.sin(alt2) + np.cos(alt1) * np.cos(alt2) * np.cos(daz)
+    return np.rad2deg(np.arctan2(num, den))
+
+def body_altaz(observe_times, location, ateam=DEFAULT_ATEAM):
+    '''Alt/az tracks (nbody x time) of the Sun, the Moon and the chosen A-team sources.'''
+    frame = AltAz(obstime=observe_times, location=location)
+    # Uses whichever ephemeris is active, see offline.setup_offline_data
+    sun = get_body('sun', observe_times, location).transform_to(frame)
+    moon = get_body('moon', observe_times, location).transform_to(frame)
+
+    alt = [sun.alt.degree, moon.alt.degree]
+    az = [sun.az.degree, moon.az.degree]
+    if len(ateam) > 0:
+        ateam_coords = SkyCoord([ATEAM[name] for name in ateam])
+        ateam_altaz = ateam_coords[:, np.newaxis].transform_to(AltAz(obstime=observe_times[np.newaxis, :], location=location))
+        alt.extend(ateam_altaz.alt.degree)
+        az.extend(ateam_altaz.az.degree)
+    return np.array(alt), np.array(az)
+
+def avoidance_components(alt, az, observe_times, location, min_alt=0., sun_sep=30., moon_sep=10., ateam_sep=10., ateam=DEFAULT_ATEAM):
+    '''
+    The two parts of avoidance_mask as separate boolean (source x time) masks: (above, clear), where
+    above is True when the source is at or above min_alt and clear is True when it is not too close
+    to the Sun, the Moon or an A-team source that is above the horizon.
+    '''
+    alt = np.atleast_2d(alt); az = np.atleast_2d(az)
+    body_alt, body_az = body_altaz(observe_times, location, ateam)
+    min_sep = np.array([sun_sep, moon_sep] + [ateam_sep] * len(ateam))
+
+    sep = angular_separation(alt[:, np.newaxis, :], az[:, np.newaxis, :], body_alt[np.newaxis], body_az[np.newaxis])
+    blocked = (sep < min_sep[np.newaxis, :, np.newaxis]) & (body_alt[np.newaxis] > 0)
+    return alt >= min_alt, ~np.any(blocked, axis=1)
+
+def avoidance_mask(alt, az, observe_times, location, min_alt=0., sun_sep=30., moon_sep=10., ateam_sep=10., ateam=DEFAULT_ATEAM):
+    '''
+    Boolean (source x time) mask, True where a slot may be scheduled. A slot is rejected if the
+    source is below min_alt or closer than the given separation [deg] to the Sun, the Moon or an
+    A-team source while that body is above the horizon. alt/az are (source x time) in degrees.
+    '''
+    above, clear = avoidance_components(alt, az, observe_times, location, min_alt, sun_sep, moon_sep, ateam_sep, ateam)
+    return above & clear
+
+def add_constraint_args(parser):
+    '''Register the avoidance options shared by the scheduling scripts.'''
+    parser.add_argument('--min-alt', type=float, help='Lowest allowed source altitude [deg]', default=0.)
+    parser.add_argument('--sun-sep', type=float, help='Minimum separation from the Sun [deg]', default=30.)
+    parser.add_argument('--moon-sep', type=float, help='Minimum separation from the Moon [deg]', default=10.)
+    parser.add_argument('--ateam-sep', type=float, help='Minimum separation from the A-team sources [deg]', default=10.)
+    parser.add_argument('--ateam', nargs='*', choices=sorted(ATEAM), help='A-team sources to avoid', default=DEFAULT_ATEAM)
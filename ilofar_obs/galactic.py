@@ -0,0 +1,48 @@
+'''
+Code Purpose: Galactic (l, b) sensitivity maps: the radiometer limit, FITS storage of swept maps and per-longitude slices.
+Author: Owen A. Johnson
+'''
+
+import numpy as np
+
+from astropy.io import fits
+
+def sens_limit(snr, tsys, Aeff, bandwidth, tobs):
+    num = snr*tsys*1380*2
+    dom = (Aeff*(np.sqrt(2*tobs*bandwidth)))
+    return num/dom
+
+def save_map(path, l, b, tsky, sens):
+    '''
+    Save the sweep as a plate carree FITS map (sensitivity in the primary HDU, Tsky in the second).
+    The reference latitude is 0 so the CAR projection stays the standard, non-oblique one, and the
+    reference longitude is the middle grid column so the whole map lies within +-180 deg of it;
+    pixel positions then read correctly in DS9 / astropy.wcs.
+    '''
+    header = fits.Header()
+    for axis, (name, values, ref) in enumerate([('GLON-CAR', l, l[len(l) // 2]), ('GLAT-CAR', b, 0.)], start=1):
+        step = values[1] - values[0] if len(values) > 1 else 1.
+        header['CTYPE%d' % axis] = name
+        header['CRPIX%d' % axis] = 1 + (ref - values[0]) / step
+        header['CRVAL%d' % axis] = ref
+        header['CDELT%d' % axis] = step
+        header['CUNIT%d' % axis] = 'deg'
+    sens_hdu = fits.PrimaryHDU(sens, header=header)
+    sens_hdu.header['BUNIT'] = 'Jy'
+    tsky_hdu = fits.ImageHDU(tsky, header=header, name='TSKY')
+    tsky_hdu.header['BUNIT'] = 'K'
+    fits.HDUList([sens_hdu, tsky_hdu]).writeto(path, overwrite=True)
+
+def load_map(path):
+    with fits.open(path) as hdul:
+        header = hdul[0].header
+        sens = hdul[0].data; tsky = hdul['TSKY'].data
+    l = header['CRVAL1'] + header['CDELT1'] * (np.arange(sens.shape[1]) + 1 - header['CRPIX1'])
+    b = header['CRVAL2'] + header['CDELT2'] * (np.arange(sens.shape[0]) + 1 - header['CRPIX2'])
+    return l, b, tsky, sens
+
+def longitude_slice(l, b, sens, long, bmin=0, bmax=75):
+    '''Sensitivity against latitude at the grid longitude nearest to long.'''
+    idx = np.argmin(np.abs((l - long + 180) % 360 - 180))
+    keep = (b >= bmin) & (b <= bmax)
+    return b[keep], sens[keep, idx]
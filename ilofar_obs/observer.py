@@ -0,0 +1,29 @@
+'''
+Code Purpose: Site and observer set-up for the LOFAR IE613 station, shared by every tool.
+Author: Owen A. Johnson
+'''
+
+import astropy.units as u
+import numpy as np
+
+from astropy.coordinates import EarthLocation
+
+LONGITUDE = 7.9219 * u.deg
+LATITUDE = 53.0950 * u.deg
+ELEVATION = 72.0 * u.m
+LOCATION = EarthLocation.from_geodetic(LONGITUDE, LATITUDE, ELEVATION)
+
+def make_observer(location=LOCATION):
+    '''astroplan Observer for I-LOFAR, only needed for the astroplan sky plots.'''
+    from astroplan import Observer
+
+    return Observer(name='I-LOFAR',
+                    location=location,
+                    pressure=0.615 * u.bar,
+                    relative_humidity=0.11,
+                    temperature=0 * u.deg_C,
+                    description="LOFAR Station IE613")
+
+def observation_times(start, hours=31, samples=1000):
+    '''Evenly spaced sample times over an observation window, as used by the planning scripts.'''
+    return start + np.linspace(0, hours, samples) * u.hour
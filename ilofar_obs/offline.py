@@ -0,0 +1,110 @@
+'''
+Code Purpose: Local IERS / ephemeris bundle so the scheduling tools start quickly and deterministically without network access
+Author: Owen A. Johnson
+'''
+
+import json
+import os
+import shutil
+import warnings
+
+import numpy as np
+
+from astropy.coordinates import solar_system_ephemeris
+from astropy.time import Time
+from astropy.utils import iers
+from astropy.utils import data as astropy_data
+
+BUNDLE_DIR = os.environ.get('ILOFAR_DATA_DIR', os.path.join(os.path.expanduser('~'), '.ilofar-obs-data'))
+IERS_FILE = 'finals2000A.all'
+MANIFEST_FILE = 'manifest.json'
+JPL_KERNEL_URL = 'https://naif.jpl.nasa.gov/pub/naif/generic_kernels/spk/planets/%s.bsp'
+
+def read_manifest(bundle_dir=BUNDLE_DIR):
+    path = os.path.join(bundle_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def setup_offline_data(bundle_dir=None, verbose=False):
+    '''
+    Point astropy at the local bundle and switch off automatic IERS downloads. Without a bundle the
+    IERS-A table bundled with astropy (astropy-iers-data) and the builtin ephemeris are used, so
+    startup never waits on the network either way. A JPL kernel that cannot be loaded (e.g. jplephem
+    is not installed) falls back to builtin with a warning. Returns the manifest (None if there is no bundle).
+    '''
+    bundle_dir = bundle_dir or BUNDLE_DIR
+    iers.conf.auto_download = False
+    iers.conf.auto_max_age = None
+    iers.conf.iers_degraded_accuracy = 'warn'
+
+    manifest = read_manifest(bundle_dir)
+    if manifest is None:
+        if verbose:
+            print('No IERS/ephemeris bundle in %s, using astropy\'s bundled IERS-A and builtin ephemeris. Run offline_data.py refresh to create one.' % bundle_dir)
+        solar_system_ephemeris.set('builtin')
+        return None
+
+    iers.earth_orientation_table.set(iers.IERS_A.open(os.path.join(bundle_dir, manifest['iers_file'])))
+    ephemeris = manifest['ephemeris']
+    path = os.path.join(bundle_dir, manifest['ephemeris_file']) if manifest.get('ephemeris_file') else ephemeris
+    try:
+        solar_system_ephemeris.set(path)
+    except (ImportError, OSError, ValueError) as err:
+        warnings.warn('Could not load the %s ephemeris from the bundle (%s), falling back to builtin' % (ephemeris, err))
+        ephemeris = 'builtin'
+        solar_system_ephemeris.set(ephemeris)
+
+    if verbose:
+        print('Using IERS/ephemeris bundle from %s (fetched %s, ephemeris %s)' % (bundle_dir, manifest['fetched'], ephemeris))
+    return manifest
+
+def refresh_bundle(bundle_dir=BUNDLE_DIR, ephemeris='builtin'):
+    '''
+    Download the latest IERS-A table (and a JPL kernel unless ephemeris is builtin) into the bundle.
+    The kernel is loaded once before the manifest is written, so a bundle that cannot be used is never recorded.
+    '''
+    os.makedirs(bundle_dir, exist_ok=True)
+
+    print('Downloading IERS-A table from %s' % iers.IERS_A_URL)
+    shutil.copyfile(astropy_data.download_file(iers.IERS_A_URL, cache=False), os.path.join(bundle_dir, IERS_FILE))
+
+    ephemeris_file = None
+    if ephemeris != 'builtin':
+        url = JPL_KERNEL_URL % ephemeris
+        print('Downloading %s ephemeris from %s' % (ephemeris, url))
+        ephemeris_file = ephemeris + '.bsp'
+        shutil.copyfile(astropy_data.download_file(url, cache=False), os.path.join(bundle_dir, ephemeris_file))
+        try:
+            solar_system_ephemeris.set(os.path.join(bundle_dir, ephemeris_file))
+        except ImportError as err:
+            raise ImportError('Loading the %s kernel needs jplephem, install it with pip install "ilofar-obs[ephemeris]"' % ephemeris) from err
+
+    manifest = {'fetched': Time.now().isot[:19], 'iers_file': IERS_FILE, 'iers_url': iers.IERS_A_URL,
+                'ephemeris': ephemeris, 'ephemeris_file': ephemeris_file}
+    with open(os.path.join(bundle_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+def check_bundle(bundle_dir=BUNDLE_DIR):
+    '''Days since the bundle was fetched, since the last measured IERS value, and until predictions run out.'''
+    manifest = read_manifest(bundle_dir)
+    if manifest is None:
+        raise FileNotFoundError('No IERS/ephemeris bundle in %s, run offline_data.py refresh' % bundle_dir)
+
+    table = iers.IERS_A.open(os.path.join(bundle_dir, manifest['iers_file']))
+    flags = np.asarray(table['PolPMFlag_A'])
+    measured = flags == 'I'
+    has_data = np.isin(flags, ['I', 'P'])
+    now = Time.now().mjd
+
+    return {
+        'fetched': manifest['fetched'],
+        'ephemeris': manifest['ephemeris'],
+        'fetched_age_days': now - Time(manifest['fetched']).mjd,
+        'last_measured': Time(table['MJD'][measured][-1], format='mjd').iso[:10],
+        'measured_age_days': now - table['MJD'][measured][-1].value,
+        'predictions_until': Time(table['MJD'][has_data][-1], format='mjd').iso[:10],
+        'prediction_days_left': table['MJD'][has_data][-1].value - now,
+    }
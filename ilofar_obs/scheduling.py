@@ -0,0 +1,31 @@
+'''
+Code Purpose: Pick the best source for every time slot and turn the picks into schedule blocks.
+Author: Owen A. Johnson
+'''
+
+import numpy as np
+
+from astropy.time import Time
+
+def best_sources(alt, allowed=None, sefd=None):
+    '''
+    Index of the best source at every time from (source x time) arrays: lowest SEFD if sefd is
+    given, otherwise highest altitude. Slots where allowed has no source are returned as -1.
+    '''
+    if allowed is None:
+        allowed = np.ones(np.shape(alt), dtype=bool)
+    if sefd is not None:
+        best_idx = np.argmin(np.where(allowed, sefd, np.inf), axis=0)
+    else:
+        best_idx = np.argmax(np.where(allowed, alt, -np.inf), axis=0)
+    best_idx[~np.any(allowed, axis=0)] = -1 # no source may be observed in this slot
+    return best_idx
+
+def schedule_blocks(best_idx):
+    '''(start, end, source) index triples for each run of the same pick, skipping empty slots and zero-length runs.'''
+    change_idxs = np.concatenate([[0], np.flatnonzero(np.diff(best_idx)) + 1, [len(best_idx) - 1]])
+    return [(start, end, best_idx[start]) for start, end in zip(change_idxs[:-1], change_idxs[1:]) if best_idx[start] >= 0 and start < end]
+
+def schedule_timefmt(time):
+    '''Schedule time stamp (YYYY-MM-DDTHH:MM) for an astropy Time or a date string, whatever its format.'''
+    return Time(time).strftime("%Y-%m-%dT%H:%M")
@@ -0,0 +1,439 @@
+'''
+Sky temperature, Tinst, Aeff, SEFD and sensitivity-limit calculations for LOFAR HBA stations.
+Needs the optional pygdsm (and healpy) dependencies.
+'''
+from astropy.coordinates import SkyCoord
+from scipy import optimize as opt
+import astropy.units as u
+import matplotlib.pyplot as plt
+import healpy as hp
+import json
+import multiprocessing
+import numpy as np
+import os
+import pickle
+import pygdsm
+
+# Number of active tiles during observations
+N_TILES = 94
+# Exponent of the cos^n(zenith) projection applied to the zenith Aeff
+AEFF_COS_POWER = 2.
+# Frequency range [MHz] of the Wijnholds (2011) HBA Tinst polynomial fit
+HBA_TINST_RANGE = (110., 250.)
+
+# Patch in helpers from tsky_orig.py
+stationDiameter = 56.5 # metres
+scaleFactor = 1.02 # van Haarlem et al. Tab. B1
+c = 299792458 # m/s
+rad2Deg = 57.2958 # deg/rad
+
+hwhm = lambda freq: rad2Deg * scaleFactor * (c / (freq * 1e6)) / stationDiameter / 2
+gauss2d = lambda sigma, x, y: np.exp(-(np.square(x)/(2 * sigma * sigma) + np.square(y) / (2 * sigma * sigma)))
+
+def powerl(x, a ,b):
+	return a * np.power(x, b)
+
+# Kondratiev et al.
+def lofar_tinst_range(band = 'HBA', freqs = None, dv = 0.):
+	"""
+	calculates the LOFAR HBA/LBA average Tinst using polynomial expressions 
+	for Tinst from fit to Wijnholds (2011) between frequencies f1 and f2 (in MHz).
+	Return value is Tinst in Kelvins.
+	If frequency array 'freqs' is given, then average Tinst will be calculated for each
+	frequency range f0-f1, f1-f2, f2-f2 of the array and returned value is an array of average Tinst's.
+	Size of the returned array is smaller by 1 than the size of the input freqs array
+	Each pair of frequencies should be either above 100 MHz or below 100 MHz
+	"""
+
+	if np.isscalar(freqs):
+		freqs = [(freqs - dv, freqs + dv)]
+
+	if band.upper() == 'HBA':
+		flow=110
+		fhigh=250
+		fstep=5
+		# polynomial coefficients
+		T_inst_poly = [6.64031379234e-08, -6.27815750717e-05, 0.0246844426766, -5.16281033712, 605.474082663, -37730.3913315, 975867.990312]
+	else:
+		print(f"Unknown band {band.upper()}. Exiting.")
+		return None
+
+	# Evaluate the polynomial on 101 samples of every range at once
+	bands = np.asarray(freqs, dtype = float).reshape(-1, 2)
+	samples = bands[:, :1] + np.arange(101) * (bands[:, 1:] - bands[:, :1]) / 100.
+	tinsts = np.sum(np.polyval(T_inst_poly, samples), axis = 1) / 100.
+
+	return tinsts
+
+# Subband width for the 200 MHz clock [MHz]
+SUBBAND_WIDTH = 200. / 1024
+# Lower edge of the Nyquist zone sampled in each HBA RCU mode [MHz]
+RCU_MODE_OFFSETS = {5: 100., 7: 200.}
+
+def subbandToFreq(subbands, rcuMode = 5):
+	"""
+	Centre frequency [MHz] of each subband for the given HBA RCU mode (200 MHz clock).
+	"""
+	return RCU_MODE_OFFSETS[rcuMode] + np.asarray(subbands, dtype = float) * SUBBAND_WIDTH
+
+def parseSubbands(spec):
+	"""
+	Parse a subband list such as "12:499" or "51:100,200,300:310" (ranges are inclusive).
+	"""
+	subbands = []
+	for part in spec.split(','):
+		if ':' in part:
+			low, high = part.split(':')
+			subbands.extend(range(int(low), int(high) + 1))
+		else:
+			subbands.append(int(part))
+	return np.array(subbands)
+
+# 2 tiles out of action -> 94
+# Kondratiev et al.
+def get_lofar_aeff_max(freqs, nelem = None, SEPTON = False):
+	"""
+	Calculate the Aeff using given frequency and EL
+	"""
+	if nelem is None:
+		nelem = N_TILES
+
+	wavelen = 300.0 / np.array(freqs)
+	# HBA
+	if np.max(freqs) >= 100.:
+		aeff = nelem * (16. if not SEPTON else 1.) * np.minimum((wavelen * wavelen)/3., 1.5625)
+	# LBA (LBA_OUTER)
+	else:
+		aeff = nelem * (wavelen * wavelen)/3.
+	return aeff
+
+def get_lofar_aeff(freqs, alt, nelem = None, SEPTON = False, cosPower = AEFF_COS_POWER):
+	"""
+	Calculate the elevation-projected Aeff, scaling the zenith maximum by cos^n(zenith angle).
+	alt is given in degrees; anything at or below the horizon has no collecting area.
+	Returned shape is freqs.shape + alt.shape.
+	"""
+	if nelem is None:
+		nelem = N_TILES
+
+	zenith = np.deg2rad(90. - np.asarray(alt, dtype = float))
+	projection = np.power(np.clip(np.cos(zenith), 0., None), cosPower)
+	return np.multiply.outer(get_lofar_aeff_max(freqs, nelem, SEPTON), projection)
+
+def calculateBrightness(snr, aeff, beamcorrection, tsys, tsky, tobs, bandwidth = 5, rfiflagged = 0.):
+	return snr * (1 * 2 * 1380 *(tsys + tsky) / (aeff / beamcorrection)) / np.sqrt(2 * bandwidth * 1e6 * (1 - rfiflagged) * tobs)
+
+
+def getCoordinateGrid(centre, frequencies, sampling = 64, nfwhm = 2):
+	grids = {frequency: (np.meshgrid(np.linspace(-nfwhm * hwhm(frequency), nfwhm * hwhm(frequency), sampling), np.linspace(-nfwhm * hwhm(frequency), nfwhm * hwhm(frequency), sampling))) for frequency in frequencies}
+
+	centre = centre.galactic
+
+	coords = {}
+	for frequency, (gridL, gridB) in grids.items():
+		coords[frequency] = centre.spherical_offsets_by(gridL * u.deg, gridB * u.deg)
+
+	return grids, coords
+
+def getSkyRegion(model, coords):
+	regions = {}
+
+	for frequency, coord in coords.items():
+		regions[frequency] = model.get_sky_temperature(coord, frequency)
+
+	return regions
+
+def applyBeamGuassian(grids, temps, plot = False):
+	gaussians = {frequency: gauss2d(hwhm(frequency), grid[0], grid[1]) for frequency, grid in grids.items()}
+
+
+	convTemp = {}
+	for (frequency, gaussian), temp, grid in zip(gaussians.items(), temps.values(), grids.values()):
+		convTemp[frequency] = np.sum(np.multiply(temp, gaussian)) / np.sum(gaussian)
+
+		if plot:
+			plt.title(f"Raw Sky Temperatures @ {frequency:.3g} MHz")
+			plt.xlabel("l [deg]")
+			plt.ylabel("b [deg]")
+			plt.pcolormesh(grid[0], grid[1], temp)
+			plt.colorbar(label = "Temperature [K]")
+			plt.scatter(0, 0, alpha = 0.2)
+			plt.savefig(f"plots/raw_{frequency:.3g}.png")
+			plt.close()
+
+			# plt.figure()
+			plt.title(f"Beam-Convolved Sky Temperatures @ {frequency:.3g} MHz ({convTemp[frequency]:.3g}K)", fontsize = 8)
+			plt.xlabel("l [deg]")
+			plt.ylabel("b [deg]")
+			plt.pcolormesh(grid[0], grid[1], np.multiply(temp, gaussian))
+			plt.colorbar(label = "Contributed Temperature [K]")
+			plt.scatter(0, 0, alpha = 0.2)
+			plt.savefig(f"plots/conv_{frequency:.3g}.png")
+			plt.close()
+			
+
+
+
+	pars, cov = opt.curve_fit(powerl, np.fromiter(convTemp.keys(), dtype = float), np.fromiter(convTemp.values(), dtype = float))
+
+	return pars, convTemp
+
+
+def getSourceTsky(source, frequencies, model = None, sampling = 64, nhwhm = 2, plot = False):
+	if model is None:
+		model = pygdsm.LowFrequencySkyModel(freq_unit = 'MHz')
+	model.generate(frequencies)
+
+	referenceValues = {frequency: model.get_sky_temperature(source, frequency) for frequency in frequencies}
+
+	grids, coords = getCoordinateGrid(source, frequencies, sampling, nhwhm)
+	temps = getSkyRegion(model, coords)
+	pars, convTemp = applyBeamGuassian(grids, temps, plot = plot)
+
+
+	return pars, convTemp, referenceValues
+
+# Generated healpix cubes, keyed by model and frequency list
+skyMapCache = {}
+
+def cubeFilePath(path):
+	"""np.save appends .npy to paths without it, so every cube path is normalised to end in .npy."""
+	return path if path.endswith('.npy') else path + '.npy'
+
+def getSkyMapCube(model, frequencies, path = None, cache = True):
+	"""
+	Generate the sky model once for a list of frequencies, returning a (nfreq, npix) healpix
+	cube in galactic coordinates. Cubes are kept in memory between calls, and optionally
+	saved to / memory-mapped from a .npy file at path. The model and frequencies are stored
+	in a .json file next to it, and a saved cube made from anything else is regenerated.
+	"""
+	key = (type(model).__name__, tuple(frequencies))
+	if key in skyMapCache:
+		return skyMapCache[key]
+
+	meta = {'model': key[0], 'frequencies': [float(freq) for freq in frequencies]}
+	if path is not None:
+		path = cubeFilePath(path)
+	cube = None
+	if path is not None and os.path.exists(path):
+		metaPath = os.path.splitext(path)[0] + '.json'
+		saved = None
+		if os.path.exists(metaPath):
+			with open(metaPath) as ref:
+				saved = json.load(ref)
+		cube = np.load(path, mmap_mode = 'r')
+		if saved != meta or cube.shape[0] != len(frequencies):
+			print(f"Sky map cube {path} was made for {saved or 'an unknown model'}, not {meta}; regenerating it.")
+			cube = None
+
+	if cube is None:
+		cube = np.atleast_2d(np.array(model.generate(list(frequencies)), dtype = np.float32))
+		if path is not None:
+			np.save(path, cube)
+			with open(os.path.splitext(path)[0] + '.json', 'w') as ref:
+				json.dump(meta, ref)
+
+	if cache:
+		skyMapCache[key] = cube
+	return cube
+
+def sphericalOffsets(lon, lat, dLon, dLat):
+	"""
+	Numpy equivalent of SkyCoord.spherical_offsets_by (all angles in degrees), which
+	broadcasts freely over arrays of centres and offsets.
+	"""
+	lon, lat, dLon, dLat = map(np.deg2rad, (lon, lat, dLon, dLat))
+
+	x = np.cos(dLat) * np.cos(dLon)
+	y = np.cos(dLat) * np.sin(dLon)
+	z = np.sin(dLat)
+
+	# Rotate the offset frame origin up to lat, then round to lon
+	xr = np.cos(lat) * x - np.sin(lat) * z
+	zr = np.sin(lat) * x + np.cos(lat) * z
+	X = np.cos(lon) * xr - np.sin(lon) * y
+	Y = np.sin(lon) * xr + np.cos(lon) * y
+
+	return np.rad2deg(np.arctan2(Y, X)) % 360., np.rad2deg(np.arcsin(np.clip(zr, -1., 1.)))
+
+def getConvolvedTsky(cube, frequencies, centres, sampling = 64, nhwhm = 2):
+	"""
+	Beam-convolved Tsky for every frequency and pointing at once, sampled directly from a
+	cube made by getSkyMapCube. Uses the same grid and Gaussian beam as getSourceTsky.
+	Returns an array of shape (nfreq, npointing).
+	"""
+	freqs = np.asarray(frequencies, dtype = float)
+	centres = centres.galactic.reshape(-1)
+
+	sigma = hwhm(freqs)[:, np.newaxis, np.newaxis]
+	unitL, unitB = np.meshgrid(np.linspace(-nhwhm, nhwhm, sampling), np.linspace(-nhwhm, nhwhm, sampling))
+	gridL, gridB = unitL * sigma, unitB * sigma
+	gaussian = gauss2d(sigma, gridL, gridB)
+
+	l, b = sphericalOffsets(centres.l.deg[:, np.newaxis, np.newaxis, np.newaxis], centres.b.deg[:, np.newaxis, np.newaxis, np.newaxis], gridL, gridB)
+	pix = hp.ang2pix(hp.npix2nside(cube.shape[-1]), l, b, lonlat = True)
+	temps = np.asarray(cube)[np.arange(len(freqs))[:, np.newaxis, np.newaxis], pix]
+
+	convTemp = np.sum(temps * gaussian, axis = (-2, -1)) / np.sum(gaussian, axis = (-2, -1))
+	return convTemp.T
+
+def getTileTsky(task):
+	"""
+	Worker for sweepGalacticGrid: band-averaged convolved Tsky for one tile of grid points,
+	read from the memory-mapped sky cube so that every worker shares the same map.
+	"""
+	cubePath, frequencies, lPoints, bPoints, sampling, nhwhm = task
+	cube = np.load(cubePath, mmap_mode = 'r')
+
+	centres = SkyCoord(l = lPoints * u.deg, b = bPoints * u.deg, frame = 'galactic')
+	return np.mean(getConvolvedTsky(cube, frequencies, centres, sampling, nhwhm), axis = 0)
+
+def sweepGalacticGrid(lValues, bValues, frequencies, model, cubePath, workers = 1, tilePoints = 128, sampling = 64, nhwhm = 2):
+	"""
+	Band-averaged convolved Tsky over a full (b, l) grid. The sky cube is generated once and
+	saved to cubePath; tiles of tilePoints grid points are then processed by a pool of workers.
+	Each tile holds several (tilePoints, nfreq, sampling, sampling) float64 arrays, so the
+	per-worker memory is set by tilePoints rather than by the grid resolution.
+	Returns an array of shape (len(bValues), len(lValues)).
+	"""
+	cubePath = cubeFilePath(cubePath)
+	getSkyMapCube(model, frequencies, path = cubePath, cache = False)
+
+	gridL, gridB = np.meshgrid(lValues, bValues)
+	lPoints, bPoints = gridL.ravel(), gridB.ravel()
+	tasks = [(cubePath, list(frequencies), lPoints[i:i + tilePoints], bPoints[i:i + tilePoints], sampling, nhwhm) for i in range(0, len(lPoints), tilePoints)]
+	if workers > 1:
+		with multiprocessing.Pool(workers) as pool:
+			tiles = pool.map(getTileTsky, tasks)
+	else:
+		tiles = list(map(getTileTsky, tasks))
+
+	return np.concatenate(tiles).reshape(gridL.shape)
+
+def getTskyTable(names, coords, frequencies, path = None, model = None, sampling = 64, nhwhm = 2, batch = 128):
+	"""
+	Band-averaged beam-convolved Tsky for every source, cached on disk in the same
+	pickle format as the --list output. Only sources missing from the cache (or cached
+	at different frequencies) are recomputed, after which the cache is rewritten. The sky
+	model is generated once and the missing sources are convolved in batches of batch
+	sources; the raw reference temperature is the cube pixel at each source.
+	"""
+	table = {}
+	if path is not None and os.path.exists(path):
+		with open(path, 'rb') as ref:
+			table = pickle.load(ref)
+
+	missing = [(name, coord) for name, coord in zip(names, coords) if name not in table or list(table[name][0][1].keys()) != list(frequencies)]
+	if missing:
+		if model is None:
+			model = pygdsm.LowFrequencySkyModel(freq_unit = 'MHz')
+		freqs = np.asarray(frequencies, dtype = float)
+		cube = getSkyMapCube(model, frequencies)
+		nside = hp.npix2nside(cube.shape[-1])
+
+		for i in range(0, len(missing), batch):
+			centres = SkyCoord([coord for _, coord in missing[i:i + batch]])
+			convTemp = getConvolvedTsky(cube, freqs, centres, sampling, nhwhm)
+			rawTemp = np.asarray(cube)[:, hp.ang2pix(nside, centres.galactic.l.deg, centres.galactic.b.deg, lonlat = True)]
+
+			for j, (name, coord) in enumerate(missing[i:i + batch]):
+				pars, cov = opt.curve_fit(powerl, freqs, convTemp[:, j])
+				table[name] = ((pars, dict(zip(frequencies, convTemp[:, j].tolist())), dict(zip(frequencies, rawTemp[:, j].tolist()))), coord)
+		if path is not None:
+			with open(path, 'wb') as ref:
+				pickle.dump(table, ref)
+
+	return np.array([np.mean(list(table[name][0][1].values())) for name in names])
+
+def getSEFD(tskys, bandwidth = 1, tobs = 1e-3, rfiFraction = 0., nelem = None):
+	if nelem is None:
+		nelem = N_TILES
+	sefd = {}
+	for freq, tsky in tskys.items():
+		sefd[freq] = calculateBrightness(1., aeff = get_lofar_aeff_max(freq, nelem), beamcorrection = 1.0, tsys = lofar_tinst_range('HBA', freqs = freq, dv = bandwidth), tsky = tsky, tobs = tobs,  bandwidth = bandwidth, rfiflagged = rfiFraction).item()
+	return sefd
+
+def getSEFDTrack(tskys, alt, bandwidth = 1, tobs = 1e-3, rfiFraction = 0., nelem = None, cosPower = AEFF_COS_POWER):
+	"""
+	SEFD time series for a source along its elevation track, one array per frequency.
+	tskys is the {freq: Tsky} dictionary returned by getSourceTsky, alt is in degrees.
+	The result can be passed straight to getSensitivityLimits.
+	"""
+	freqs = np.fromiter(tskys.keys(), dtype = float)
+	tsky = np.fromiter(tskys.values(), dtype = float)[:, np.newaxis]
+	bandFreqs = np.stack([freqs - bandwidth, freqs + bandwidth], axis = -1)
+
+	tinst = np.asarray(lofar_tinst_range('HBA', bandFreqs))[:, np.newaxis]
+	aeff = get_lofar_aeff(freqs, alt, nelem, cosPower = cosPower)
+
+	with np.errstate(divide = 'ignore'):
+		sefd = calculateBrightness(1., aeff = aeff, beamcorrection = 1.0, tsys = tinst, tsky = tsky, tobs = tobs, bandwidth = bandwidth, rfiflagged = rfiFraction)
+	return dict(zip(tskys.keys(), sefd))
+
+def getSEFDMatrix(tsky, alt, frequencies, nelem = None, cosPower = AEFF_COS_POWER, bandwidth = 1, tobs = 1e-3, rfiFraction = 0.):
+	"""
+	Band-averaged SEFD for every (source, time) pair in a single vectorised call.
+	tsky has shape (nsrc,), alt has shape (nsrc, ntime) in degrees. Samples below the
+	horizon have zero Aeff and so come back as an infinite SEFD. Tinst and Aeff are
+	evaluated with the frequencies clipped to HBA_TINST_RANGE, outside of which the Tinst
+	polynomial diverges and would swamp the per-source Tsky term.
+	"""
+	freqs = np.clip(np.asarray(frequencies, dtype = float), *HBA_TINST_RANGE)
+	bandFreqs = np.clip(np.stack([freqs - bandwidth, freqs + bandwidth], axis = -1), *HBA_TINST_RANGE)
+
+	tinst = np.mean(lofar_tinst_range('HBA', bandFreqs))
+	aeff = np.mean(get_lofar_aeff(freqs, alt, nelem, cosPower = cosPower), axis = 0)
+
+	with np.errstate(divide = 'ignore'):
+		return calculateBrightness(1., aeff = aeff, beamcorrection = 1.0, tsys = tinst, tsky = np.asarray(tsky, dtype = float)[:, np.newaxis], tobs = tobs, bandwidth = bandwidth, rfiflagged = rfiFraction)
+
+def getSEFD_bandavg(source, frequencies, model = None, vsamp = 5., tobs = 1e-3, rfiFraction = 0., sampling = 64, nhwhm = 2, nelem = None, plot = False):
+	"""
+	Band-averaged SEFD for a pulse of tobs seconds spanning frequencies = (low, high) [MHz].
+	Tsky, Tinst and Aeff are averaged over vsamp MHz wide channels across the band.
+	"""
+	freqs = np.arange(frequencies[0] + vsamp / 2, frequencies[1] - vsamp / 2 + vsamp, vsamp)[:, np.newaxis]
+	bandFreqs = np.hstack([freqs, freqs])
+	bandFreqs[:, 0] -= vsamp / 2
+	bandFreqs[:, 1] += vsamp / 2
+
+
+	aeffAvg = np.mean(get_lofar_aeff_max(freqs, nelem))
+	tsysAvg = np.mean(lofar_tinst_range('HBA', bandFreqs))
+
+	res = getSourceTsky(source, freqs[:, 0].tolist(), model = model, sampling = sampling, nhwhm = nhwhm, plot = plot)
+	tskyAvg = np.mean(list(res[1].values()))
+
+	return calculateBrightness(1., aeff = aeffAvg, beamcorrection = 1.0, tsys = tsysAvg, tsky = tskyAvg, tobs = tobs, bandwidth = frequencies[1] - frequencies[0], rfiflagged = rfiFraction)
+
+def getSEFD_channels(source, frequencies, model, chanWidth = SUBBAND_WIDTH, tobs = 1e-3, rfiFraction = 0., sampling = 64, nhwhm = 2, batch = 32, nelem = None):
+	"""
+	Per-channel SEFD for an arbitrary list of channel frequencies (e.g. every subband).
+	Tsky, Tinst and Aeff are evaluated as arrays; the sky model is generated for batches of
+	channels at a time to bound the size of the healpix cube held in memory.
+	Returns (tsky, tinst, aeff, sefd) arrays with one value per channel.
+	"""
+	if nelem is None:
+		nelem = N_TILES
+	freqs = np.asarray(frequencies, dtype = float)
+
+	tsky = np.concatenate([getConvolvedTsky(getSkyMapCube(model, freqs[i:i + batch], cache = False), freqs[i:i + batch], source, sampling, nhwhm)[:, 0] for i in range(0, len(freqs), batch)])
+	tinst = lofar_tinst_range('HBA', np.stack([freqs - chanWidth / 2, freqs + chanWidth / 2], axis = -1))
+	aeff = get_lofar_aeff_max(freqs, nelem)
+
+	sefd = calculateBrightness(1., aeff = aeff, beamcorrection = 1.0, tsys = tinst, tsky = tsky, tobs = tobs, bandwidth = chanWidth, rfiflagged = rfiFraction)
+	return tsky, tinst, aeff, sefd
+
+def getSensitivityLimits(sefd, snr, width_ms, bandwidth_MHz):
+	sensitivity = {}
+	for freq, sefdv in sefd.items():
+		sensitivity[freq] = sefdv * snr / np.sqrt(width_ms * bandwidth_MHz)
+	return sensitivity
+
+
+skyModels = {
+	'LFSS': pygdsm.LowFrequencySkyModel,
+	'GSM2008': pygdsm.GlobalSkyModel,
+	'GSM2016': pygdsm.GlobalSkyModel16,
+	'HASLAM': pygdsm.HaslamSkyModel,
+}
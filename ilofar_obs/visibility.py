@@ -0,0 +1,92 @@
+'''
+Code Purpose: Vectorized (source x time) alt/az tracks, and a multi-week visibility cube stored as quantized, memory-mapped int16 arrays that can be sliced without recomputing.
+Author: Owen A. Johnson
+'''
+
+import json
+import os
+
+import astropy.units as u
+import numpy as np
+
+from astropy.coordinates import AltAz
+from astropy.time import Time
+from tqdm import tqdm
+
+from .observer import LOCATION
+
+# Quantization: 0.01 deg steps, az stored relative to 180 deg so both fit in int16
+ALT_SCALE = 100.
+AZ_SCALE = 100.
+AZ_OFFSET = 180.
+
+def altaz_tracks(coords, times, location=LOCATION):
+    '''(source x time) alt and az in degrees from a single broadcast transform.'''
+    altaz = coords[:, np.newaxis].transform_to(AltAz(obstime=times[np.newaxis, :], location=location))
+    return altaz.alt.degree, altaz.az.degree
+
+def quantize_altaz(alt, az):
+    '''Alt/az in degrees to the int16 values stored in the cube (0.01 deg steps).'''
+    return np.round(np.asarray(alt) * ALT_SCALE).astype(np.int16), np.round((np.asarray(az) - AZ_OFFSET) * AZ_SCALE).astype(np.int16)
+
+def dequantize_altaz(alt, az):
+    '''Inverse of quantize_altaz, back to float32 degrees.'''
+    return alt / np.float32(ALT_SCALE), az / np.float32(AZ_SCALE) + np.float32(AZ_OFFSET)
+
+def build_visibility_cube(path, names, coords, start, days, cadence, location=LOCATION, chunk=1440):
+    '''
+    Compute alt/az for every source over days from start at cadence (minutes) and write them to
+    path/alt.npy and path/az.npy as (source x time) int16 memory maps. Times are processed in
+    chunks of chunk samples so the full cube never has to fit in memory.
+    '''
+    os.makedirs(path, exist_ok=True)
+    n_times = int(days * 24 * 60 / cadence) + 1
+    offsets = np.arange(n_times) * cadence * u.min
+
+    alt_map = np.lib.format.open_memmap(os.path.join(path, 'alt.npy'), mode='w+', dtype=np.int16, shape=(len(coords), n_times))
+    az_map = np.lib.format.open_memmap(os.path.join(path, 'az.npy'), mode='w+', dtype=np.int16, shape=(len(coords), n_times))
+
+    for i in tqdm(range(0, n_times, chunk)):
+        times = start + offsets[i:i + chunk]
+        alt, az = altaz_tracks(coords, times, location)
+        alt_map[:, i:i + chunk], az_map[:, i:i + chunk] = quantize_altaz(alt, az)
+    alt_map.flush(); az_map.flush()
+
+    meta = {
+        'start': start.isot,
+        'cadence_min': cadence,
+        'n_times': n_times,
+        'names': [str(name) for name in names],
+        'ra_rad': coords.ra.radian.tolist(),
+        'dec_rad': coords.dec.radian.tolist(),
+        'location': [location.lon.degree, location.lat.degree, location.height.to_value(u.m)],
+    }
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+
+def load_visibility_cube(path):
+    '''Open a cube for reading; alt/az stay on disk as int16 memory maps until sliced.'''
+    with open(os.path.join(path, 'meta.json')) as f:
+        cube = json.load(f)
+    cube['start'] = Time(cube['start'], format='isot', scale='utc')
+    cube['alt'] = np.load(os.path.join(path, 'alt.npy'), mmap_mode='r')
+    cube['az'] = np.load(os.path.join(path, 'az.npy'), mmap_mode='r')
+    return cube
+
+def time_index(cube, time):
+    '''Index of the cube sample at or just before time.'''
+    idx = int(np.floor((time - cube['start']).to_value(u.min) / cube['cadence_min']))
+    if idx < 0 or idx >= cube['n_times']:
+        raise ValueError('%s is outside the cube, which covers %s onwards for %d samples' % (time.isot, cube['start'].isot, cube['n_times']))
+    return idx
+
+def slice_window(cube, start, end, sources=slice(None)):
+    '''
+    Times and dequantized (source x time) alt/az in degrees between start and end. Only the
+    requested window (and sources) is read from disk.
+    '''
+    i0 = time_index(cube, start)
+    i1 = int(np.clip(np.floor((end - cube['start']).to_value(u.min) / cube['cadence_min']) + 1, i0 + 1, cube['n_times']))
+    times = cube['start'] + np.arange(i0, i1) * cube['cadence_min'] * u.min
+    alt, az = dequantize_altaz(cube['alt'][sources, i0:i1], cube['az'][sources, i0:i1])
+    return times, alt, az
@@ -0,0 +1,147 @@
+'''
+Code Purpose: Observing windows: the 30 deg / max - 10 deg rule from altaz-single-target.py, run finding on masks, and a rolling in-memory set of windows for long-running processes.
+Author: Owen A. Johnson
+'''
+
+import warnings
+
+import numpy as np
+
+from astropy.time import Time
+
+from .observer import LOCATION
+from .visibility import altaz_tracks, slice_window
+
+def window_thresholds(max_alt):
+    '''Window threshold for a given peak altitude: 30 deg if the peak is above 30 deg, max - 10 deg otherwise.'''
+    return np.where(np.asarray(max_alt) > 30, 30., np.asarray(max_alt) - 10)
+
+def observing_window(alt):
+    '''
+    Peak index of a 1D alt track and the last / first samples at or below the window threshold
+    before / after it (None when the track does not get that low within the samples).
+    Returns (max_idx, before_idx, after_idx, threshold).
+    '''
+    max_idx = int(np.argmax(alt))
+    threshold = float(window_thresholds(alt[max_idx]))
+    before = np.flatnonzero(alt[:max_idx] <= threshold)
+    after = np.flatnonzero(alt[max_idx:] <= threshold)
+    return max_idx, (before[-1] if len(before) else None), (after[0] + max_idx if len(after) else None), threshold
+
+def transit_windows(alt):
+    '''
+    Observing window around every transit in a multi-day 1D alt track. The track is cut at the
+    altitude minima between transits and observing_window is applied to each piece.
+    Returns (start, end, max_idx, rise_idx, set_idx, threshold) per piece, with start/end the piece
+    bounds (end exclusive) and rise/set the first/last samples inside the window, or None when the
+    track does not drop to the threshold on that side within the piece.
+    '''
+    alt = np.asarray(alt)
+    minima = np.flatnonzero((alt[1:-1] < alt[:-2]) & (alt[1:-1] <= alt[2:])) + 1
+    bounds = np.concatenate([[0], minima, [len(alt)]])
+
+    windows = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        max_idx, before, after, threshold = observing_window(alt[start:end])
+        windows.append((start, end, start + max_idx, None if before is None else start + before + 1,
+                        None if after is None else start + after - 1, threshold))
+    return windows
+
+def mask_intervals(mask):
+    '''(start, end) index pairs of each run of True values in a 1D mask, end exclusive.'''
+    edges = np.diff(np.concatenate([[0], np.asarray(mask, dtype=np.int8), [0]]))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+def mjd_isot(mjd):
+    return Time(mjd, format='mjd').isot[:19]
+
+class VisibilityWindows:
+    '''
+    Alt tracks for the whole catalogue from now to now + horizon, plus the rise/set events
+    against the threshold altaz-single-target.py uses: 30 deg when the source peaks above 30 deg
+    in the next day, max - 10 deg otherwise. The threshold is never below min_alt, so sources that
+    peak low (or never rise) are not reported as up while they are below the horizon.
+    '''
+
+    def __init__(self, names, coords, location=LOCATION, horizon=31, cadence=1, refresh=30, cube=None, min_alt=0.):
+        self.names = np.asarray(names)
+        self.coords = coords
+        self.location = location
+        self.horizon = horizon / 24.
+        self.cadence = cadence / (24. * 60.)
+        self.refresh = refresh / (24. * 60.)
+        self.min_alt = min_alt
+        self.cube = cube
+        if cube is not None:
+            self.cadence = cube['cadence_min'] / (24. * 60.)
+            self.cube_start = cube['start'].mjd
+            self.cube_end = self.cube_start + (cube['n_times'] - 1) * self.cadence
+        self.mjd = np.empty(0)
+        self.alt = np.empty((len(coords), 0), dtype=np.float32)
+
+    def extension(self, now):
+        '''Samples needed to cover up to now + horizon, computed without touching the current state.'''
+        start = self.mjd[-1] + self.cadence if len(self.mjd) else now
+        new_mjd = np.arange(start, now + self.horizon + self.cadence, self.cadence)
+        if len(new_mjd) == 0:
+            return new_mjd, np.empty((len(self.coords), 0), dtype=np.float32)
+
+        if self.cube is None or not self.cube_start <= new_mjd[0] <= self.cube_end:
+            if self.cube is not None:
+                warnings.warn('Outside the visibility cube (%s to %s), computing tracks instead' % (mjd_isot(self.cube_start), mjd_isot(self.cube_end)))
+            alt, _ = altaz_tracks(self.coords, Time(new_mjd, format='mjd'), self.location)
+            return new_mjd, alt.astype(np.float32)
+
+        # Half a sample in, so the first cube index is the one after the last stored sample
+        times, alt, _ = slice_window(self.cube, Time(new_mjd[0] + self.cadence / 2, format='mjd'), Time(new_mjd[-1], format='mjd'))
+        cube_mjd, cube_alt = times.mjd, alt.astype(np.float32)
+        if new_mjd[-1] <= self.cube_end:
+            return cube_mjd, cube_alt
+
+        # The cube ends inside the horizon: continue on its time grid with computed tracks
+        warnings.warn('Visibility cube ends at %s, computing tracks beyond it' % mjd_isot(self.cube_end))
+        rest = np.arange(cube_mjd[-1] + self.cadence, now + self.horizon + self.cadence, self.cadence)
+        rest_alt, _ = altaz_tracks(self.coords, Time(rest, format='mjd'), self.location)
+        return np.concatenate([cube_mjd, rest]), np.concatenate([cube_alt, rest_alt.astype(np.float32)], axis=1)
+
+    def apply(self, now, new_mjd, new_alt):
+        '''Drop samples that are in the past, append the new ones and rebuild the events.'''
+        keep = self.mjd >= now - self.cadence
+        self.mjd = np.concatenate([self.mjd[keep], new_mjd])
+        self.alt = np.concatenate([self.alt[:, keep], new_alt], axis=1)
+
+        day = self.alt[:, self.mjd < self.mjd[0] + 1]
+        self.peak = day.max(axis=1)
+        self.threshold = np.maximum(window_thresholds(self.peak), self.min_alt)
+        self.above = self.alt > self.threshold[:, np.newaxis]
+
+        crossing = np.diff(self.above.astype(np.int8), axis=1)
+        src, idx = np.nonzero(crossing)
+        order = np.argsort(self.mjd[idx + 1], kind='stable')
+        self.event_src = src[order]
+        self.event_rise = crossing[src, idx][order] > 0
+        self.event_mjd = self.mjd[idx + 1][order]
+        self.next_refresh = now + self.refresh
+
+    def event(self, i):
+        src = self.event_src[i]
+        return {'event': 'rise' if self.event_rise[i] else 'set', 'source': str(self.names[src]), 'time': mjd_isot(self.event_mjd[i]),
+                'threshold': round(float(self.threshold[src]), 2), 'max_alt': round(float(self.peak[src]), 2)}
+
+    def events_between(self, start, end):
+        i0, i1 = np.searchsorted(self.event_mjd, [start, end], side='right')
+        return [self.event(i) for i in range(i0, i1)]
+
+    def next_event_mjd(self, now):
+        i = np.searchsorted(self.event_mjd, now, side='right')
+        return self.event_mjd[i] if i < len(self.event_mjd) else np.inf
+
+    def up_now(self, now):
+        i = min(np.searchsorted(self.mjd, now), len(self.mjd) - 1)
+        up = np.flatnonzero(self.above[:, i])
+        return [{'source': str(self.names[src]), 'alt': round(float(self.alt[src, i]), 2), 'threshold': round(float(self.threshold[src]), 2)} for src in up]
+
+    def upcoming(self, now, n=5):
+        i0 = np.searchsorted(self.event_mjd, now, side='right')
+        rises = np.flatnonzero(self.event_rise[i0:])[:n] + i0
+        return [self.event(i) for i in rises]
@@ -14,12 +14,15 @@ import os
 # import scienceplots; plt.style.use(['science', 'no-latex'])
 import smplotlib
 
-from astropy.coordinates import EarthLocation, SkyCoord, solar_system_ephemeris, get_body, AltAz
+from astropy.coordinates import SkyCoord, get_body, AltAz
 from astropy.time import Time
-from astroplan import Observer, FixedTarget
+from astroplan import FixedTarget
 from astroplan.plots import plot_sky
 from datetime import datetime
 
+from ilofar_obs import (LOCATION, BENCHMARKS, make_observer, observation_times, add_constraint_args, avoidance_components,
+                        mask_intervals, observing_window, setup_offline_data)
+
 # ------------------------------------
 #          - Set up Arguments -
 # ------------------------------------
@@ -28,8 +31,17 @@ parser.add_argument('--name', type=str, help='Name of the target', required=True
 parser.add_argument('--date', help='Date of observation in form YYYY-MM-DD HH:MM:SS', default=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
 parser.add_argument('ra', type=float, help='Right Ascension of the target in radians or degrees', nargs='?')
 parser.add_argument('dec', type=float, help='Declination of the target in radians or degrees', nargs='?')
+parser.add_argument('--sefd', action='store_true', help='Also compute SEFD and sensitivity-limit time series along the elevation track')
+parser.add_argument('--freqs', type=float, nargs='+', help='Frequencies [MHz] for the sensitivity track', default=[120, 150, 180])
+parser.add_argument('--ntiles', type=int, help='Number of HBA tiles used for observation', default=None)
+parser.add_argument('--cos_power', type=float, help='Exponent n of the cos^n(zenith) effective area projection', default=2.)
+parser.add_argument('--snr', type=float, help='Signal-to-noise ratio for the sensitivity limit', default=10.)
+parser.add_argument('--width', type=float, help='Pulse width [ms] for the sensitivity limit', default=5.)
+parser.add_argument('--bw', type=float, help='Bandwidth [MHz] for the sensitivity limit', default=10.)
+add_constraint_args(parser)
 
 args = parser.parse_args()
+setup_offline_data(verbose=True)
 
 # --- Check if the date is in the correct format ---
 try:
@@ -82,40 +94,29 @@ else:
 # ------------------------------------
 
 # Set up Observer, Target and observation time objects.
-longitude = 7.9219 * u.deg
-latitude = 53.0950 * u.deg
-elevation = 72.0 * u.m
-location = EarthLocation.from_geodetic(longitude, latitude, elevation)
-
-observer = Observer(name='I-LOFAR',
-               location=location,
-               pressure=0.615 * u.bar,
-               relative_humidity=0.11,
-               temperature=0 * u.deg_C,
-               description="LOFAR Station IE613")
+location = LOCATION
+observer = make_observer()
 
 observe_time = Time(args.date); print('Observation start time:', observe_time)
 obs_window = 31; print('Observation window:', obs_window, 'hours')
 increment = obs_window / 1000; print('Time increment:', increment, 'minutes')  # Divide the window into 1000 increments
-observe_times = observe_time + np.linspace(0, obs_window, 1000) * u.hour
+observe_times = observation_times(observe_time, obs_window)
 
 # ------------------------------------
 #          - Benchmark Targets -
 # ------------------------------------
 
 # - Polaris -
-coordinates = SkyCoord('02h31m49.09s', '+89d15m50.8s', frame='icrs')
-polaris = FixedTarget(name='Polaris', coord=coordinates)
+polaris = FixedTarget(name='Polaris', coord=BENCHMARKS['Polaris'])
 polaris_style = {'color': 'k', 'marker': '*'}
 
 # - Crab Pulsar - 
-coordinates = SkyCoord('05h34m31.93830s', '+22d00m52.1758s', frame='icrs')
-crab = FixedTarget(name='Crab', coord=coordinates)
+crab = FixedTarget(name='Crab', coord=BENCHMARKS['Crab'])
 crab_style = {'color': 'r','marker': 'o'}
 
 # - Sun - 
-with solar_system_ephemeris.set('builtin'):
-    sun_coords = get_body('sun', observe_times, location) 
+# Ephemeris comes from the offline data bundle (builtin if there is none)
+sun_coords = get_body('sun', observe_times, location)
 sun = FixedTarget(name='Sun', coord=sun_coords)
 sun_style = {'color': 'y'}
 
@@ -131,6 +132,18 @@ else:
     alt = coord_deg.transform_to(AltAz(obstime=observe_times, location=location)).alt.degree
     az = coord_deg.transform_to(AltAz(obstime=observe_times, location=location)).az.degree
 
+# - Sensitivity Track -
+if args.sefd:
+    if trgt_name == 'Sun':
+        raise ValueError('The sky models do not include the Sun, cannot compute a sensitivity track for it.')
+    from ilofar_obs.sensitivity import getSourceTsky, getSEFDTrack, getSensitivityLimits
+
+    tsky_pars, tskys, _ = getSourceTsky(coord_deg, args.freqs)
+    sefd_track = getSEFDTrack(tskys, alt, nelem=args.ntiles, cosPower=args.cos_power)
+    sensitivity_track = getSensitivityLimits(sefd_track, args.snr, args.width, args.bw)
+    for freq, sens in sensitivity_track.items():
+        print(f'{freq} MHz: best sensitivity limit {np.min(sens) * 1e3:.4g} mJy at max altitude')
+
 # ------------------------------------
 #        - Plotting Results -
 # ------------------------------------
@@ -146,8 +159,13 @@ plt.close()
 #%%
 plt.figure(figsize=(20, 8))
 # Creating subplots with shared x-axis
-ax1 = plt.subplot(2, 2, 1)
-ax2 = plt.subplot(2, 2, 3, sharex=ax1)
+if args.sefd:
+    ax1 = plt.subplot(3, 2, 1)
+    ax2 = plt.subplot(3, 2, 3, sharex=ax1)
+    ax4 = plt.subplot(3, 2, 5, sharex=ax1)
+else:
+    ax1 = plt.subplot(2, 2, 1)
+    ax2 = plt.subplot(2, 2, 3, sharex=ax1)
 ax3 = plt.subplot(1, 2, 2)
 
 # Plotting azimuth
@@ -162,42 +180,31 @@ ax1.grid(True)
 
 # Plotting altitude
 
-# Find where altitude is max_alt - 10 on either side
-max_alt_index = np.where(alt == np.max(alt))[0][0]
-max_alt = np.max(alt)
-
-# Check if the max altitude is greater than 30 degrees
-if max_alt > 30:
-    print(f"Max altitude ({max_alt}) is greater than 30°, finding where it crosses 30° instead of max-10°.")
-
-    # Find where altitude crosses 30 degrees before and after the max altitude
-    try:
-        before_max_index = np.where(alt[:max_alt_index] <= 30)[0][-1]
-    except IndexError:
-        before_max_index = None
-        print("No altitude crossing below 30° before the max altitude")
-
-    try:
-        after_max_index = np.where(alt[max_alt_index:] <= 30)[0][0] + max_alt_index
-    except IndexError:
-        after_max_index = None
-        print("No altitude crossing below 30° after the max altitude")
+# Slots too close to the Sun, Moon or an A-team source (or below the altitude floor) are excluded from the window.
+# Only the separation conflicts while the target is above the floor are reported and shaded, not every night.
+if trgt_name == 'Sun':
+    allowed = np.ones(len(alt), dtype=bool)
 else:
-    print(f"Max altitude ({max_alt}) is less than or equal to 30°, using max-10° rule.")
-
-    # Initialize variables for before and after max
-    before_max_index, after_max_index = None, None
-
-    # Try to find the 10° drop points, handle out-of-bounds exceptions
-    try:
-        before_max_index = np.where(alt[:max_alt_index] <= max_alt - 10)[0][-1]
-    except IndexError:
-        print("No altitude drop by 10° before the max altitude")
-
-    try:
-        after_max_index = np.where(alt[max_alt_index:] <= max_alt - 10)[0][0] + max_alt_index
-    except IndexError:
-        print("No altitude drop by 10° after the max altitude")
+    above, clear = avoidance_components(alt, az, observe_times, location, min_alt=args.min_alt, sun_sep=args.sun_sep,
+                                        moon_sep=args.moon_sep, ateam_sep=args.ateam_sep, ateam=args.ateam)
+    above, clear = above[0], clear[0]
+    allowed = above & clear
+    for start, end in mask_intervals(above & ~clear):
+        print(f"Target too close to the Sun/Moon/A-team from {observe_times.datetime[start].strftime('%H:%M')} to {observe_times.datetime[end - 1].strftime('%H:%M')}")
+        ax2.axvspan(observe_times.datetime[start], observe_times.datetime[end - 1], color='grey', alpha=0.3)
+if not np.any(allowed):
+    raise ValueError('%s is never observable under the avoidance constraints in this window' % trgt_name)
+window_alt = np.where(allowed, alt, -np.inf)
+
+# Find the window: 30° crossings if the peak is above 30°, otherwise where it is 10° below the peak
+max_alt_index, before_max_index, after_max_index, threshold = observing_window(window_alt)
+max_alt = window_alt[max_alt_index]
+rule = '30°' if threshold == 30 else 'max-10°'
+print(f"Max altitude ({max_alt}) {'is greater than' if threshold == 30 else 'is less than or equal to'} 30°, using the {rule} rule.")
+if before_max_index is None:
+    print(f"No altitude crossing below {rule} before the max altitude")
+if after_max_index is None:
+    print(f"No altitude crossing below {rule} after the max altitude")
 
 # Plot the altitude and vertical lines if the indices are found
 ax2.plot(observe_times.datetime, alt, label='Altitude', color='black')
@@ -217,6 +224,17 @@ ax2.set_ylabel('Altitude')
 ax2.legend(frameon=True, fontsize=8)
 ax2.grid(True)
 
+# Plotting sensitivity limit (infinite below the horizon, so left blank there)
+if args.sefd:
+    plt.setp(ax2.get_xticklabels(), visible=False)
+    for freq, sens in sensitivity_track.items():
+        ax4.plot(observe_times.datetime, np.where(np.isfinite(sens), sens * 1e3, np.nan), label=f'{freq:.0f} MHz')
+    ax4.set_yscale('log')
+    ax4.set_xlabel('Time')
+    ax4.set_ylabel('Sensitivity Limit (mJy)')
+    ax4.legend(frameon=True, fontsize=8)
+    ax4.grid(True)
+
 # Displaying image
 img = mpimg.imread('sky-plot.png')
 flipped_img = np.flipud(img)  # Flip image vertically
@@ -239,4 +257,8 @@ date_string = f"{day_name}, {month}, {day_of_month}{day_suffix}"
 plt.suptitle('%s observation from IE613 starting %s' % (trgt_name, date_string), fontsize=16)
 plt.tight_layout()
 plt.savefig('./elevation-plots/%s-elevation-plot-%s.png' % (trgt_name, (str(day_of_month) + str(month))), dpi=200)
+if args.sefd:
+    np.savetxt('./elevation-plots/%s-sensitivity-%s.txt' % (trgt_name, (str(day_of_month) + str(month))),
+               np.column_stack([observe_times.mjd, alt] + [sens for sens in sensitivity_track.values()]),
+               header='MJD Alt[deg] ' + ' '.join('Slim_%gMHz[Jy]' % freq for freq in sensitivity_track.keys()))
 plt.show()
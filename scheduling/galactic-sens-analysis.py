@@ -1,130 +1,71 @@
 '''
-
+Code Purpose: Sensitivity limits across the galactic sky for I-LOFAR, computed over a full (l, b) grid.
+Author: Owen A. Johnson
 '''
-#%% 
+#%%
 import numpy as np
 import matplotlib.pyplot as plt
-from astropy import units as u
-from astropy.coordinates import SkyCoord
-import subprocess
-from tqdm import tqdm
-
-#%%
-def fitting(x, y): 
-    z = np.polyfit(x, y, 5)
-    smoothing_x = np.linspace(0, 75, 1000)
-    smoothing_y = np.polyval(z, smoothing_x)
-    return smoothing_x, smoothing_y
-
-def sens_limit(snr, tsys, Aeff, bandwidth, tobs): 
-    num = snr*tsys*1380*2
-    print(num)
-    dom = (Aeff*(np.sqrt(2*tobs*bandwidth)))  
-    print(dom)
-    return num/dom
-
-def conv_generation(long): 
-# Galactic center coordinates
-    gal_lat = np.linspace(0, 75, 20) * u.deg; gal_long = np.linspace(0, long, 20) * u.deg
-    gc = SkyCoord(l=gal_long, b=gal_lat, frame='galactic')
-    # plot the galactic center
-
-    gc_radec = gc.transform_to('icrs')      
-    ra_rad = gc_radec.ra.radian; dec_rad = gc_radec.dec.radian
-    conv_temps = [] # mean convolved temperature
-
-    lofar_bandwidth = 3.66e6 # Hz
-    
-
-    for i in tqdm(range(0, len(ra_rad))):
-
-        command = 'python ./tsky_sefd_LOFAR_ilt.py --ra %s --dec %s' % (ra_rad[i], dec_rad[i])
-        output = subprocess.check_output(command, shell=True).decode('utf-8')
-
-        freq = []; conv_temp = []; raw_temp = []; diff_temp = []
-        lines = output.strip().split('\n')
-
-        for line in lines[4:]:
-            # Split each line by tabs
-            columns = line.split('\t')
-            # print(columns)
-            freq.append(float(columns[0].split(':')[0]))
-            print(columns[0].split(':')[0]) 
-            conv_temp.append(float(columns[2]))
-            raw_temp.append(float(columns[4]))
-            diff_temp.append(float(columns[6]))
-        
-        mean_conv_temp = np.mean(conv_temp)
-        conv_temps = np.append(conv_temps, mean_conv_temp)
-
-    Aeff = 2048
-    pulse_width = 1# seconds
-    period = 1 # seconds
-    tobs_v = 60*80 
-    return sens_limit(10, conv_temps, Aeff, lofar_bandwidth, tobs_v)
-#%%
-    
-
-convK_0 = conv_generation(0)
-convK_60 = conv_generation(60)
-convK_120 = conv_generation(120)
-convK_180 = conv_generation(180)
-convK_240 = conv_generation(240)
-convK_300 = conv_generation(300)
-convK_360 = conv_generation(360)
-
-#%% 
-import scienceplots; plt.style.use(['science', 'ieee'])
-
-
-gal_lat = np.linspace(0, 75, 20) * u.deg; gal_long = np.linspace(0, 0, 20) * u.deg
-smoothing_x, smoothing_y = fitting(gal_lat.value, convK_0*1000)
-
-# -- plot aitoff projection --- 
-plt.figure()
-plt.subplot(111, projection='aitoff')
-plt.grid(True)
-plt.plot(gal_long, gal_lat, 'o', markersize=2)
-plt.xlabel('Galactic Longitude (deg)')
-plt.ylabel('Galactic Latitude (deg)')
-
-# convert to ra and dec radians 
-gc = SkyCoord(l=gal_long, b=gal_lat, frame='galactic')
-gc_radec = gc.transform_to('icrs')
-ra_rad = gc_radec.ra.radian; dec_rad = gc_radec.dec.radian
-plt.figure()
-plt.grid(True)
-plt.plot(ra_rad, dec_rad, 'o', markersize=2)
-plt.xlabel('RA (radians)')
-plt.ylabel('Dec (radians)')
-
-
-
-plt.figure(figsize=(5, 4))
-
-plt.plot(smoothing_x, smoothing_y, 'r--', label='$l = 0 $')
-
-smoothing_x, smoothing_y = fitting(gal_lat.value, convK_60*1000)
-plt.plot(smoothing_x, smoothing_y, 'b--', label='$l = 60 $')
-
-smoothing_x, smoothing_y = fitting(gal_lat.value, convK_120*1000)
-plt.plot(smoothing_x, smoothing_y, 'g--', label='$l = 120 $')
-
-smoothing_x, smoothing_y = fitting(gal_lat.value, convK_180*1000)
-plt.plot(smoothing_x, smoothing_y, 'y--', label='$l = 180 $')
-
-smoothing_x, smoothing_y = fitting(gal_lat.value, convK_240*1000)
-plt.plot(smoothing_x, smoothing_y, 'm--', label='$l = 240 $')
-
-smoothing_x, smoothing_y = fitting(gal_lat.value, convK_300*1000)
-plt.plot(smoothing_x, smoothing_y, 'c--', label='$l = 300 $')
-
-# smoothing_x, smoothing_y = fitting(gal_lat.value, convK_360*1000)
-# plt.plot(smoothing_x, smoothing_y, 'k--', label='$l = 360 $')
-
-
-plt.xlabel('Galactic Latitude (deg)')
-plt.ylabel('Sensitivity Limit (mJy)')
-plt.legend(frameon=True)
-plt.show()
+import argparse
+import os
+
+from ilofar_obs.galactic import sens_limit, save_map, load_map, longitude_slice
+from ilofar_obs.sensitivity import sweepGalacticGrid, skyModels
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compute I-LOFAR sensitivity limits over a galactic (l, b) grid')
+    parser.add_argument('--dl', type=float, help='Longitude resolution [deg]', default=5.)
+    parser.add_argument('--db', type=float, help='Latitude resolution [deg]', default=2.5)
+    parser.add_argument('--bmin', type=float, help='Lowest latitude in the grid [deg]', default=-90.)
+    parser.add_argument('--bmax', type=float, help='Highest latitude in the grid [deg]', default=90.)
+    parser.add_argument('--freqs', type=float, nargs='+', help='Frequencies [MHz] Tsky is averaged over', default=[100, 150, 200])
+    parser.add_argument('--model', default='LFSS', choices=sorted(skyModels), help='Sky model to generate Tsky values from')
+    parser.add_argument('--samples', type=int, help='Samples per axis of the beam convolution grid', default=64)
+    parser.add_argument('--nhwhm', type=float, help='Width of the convolution grid in beam HWHMs', default=2)
+    parser.add_argument('--workers', type=int, help='Number of parallel worker processes', default=os.cpu_count())
+    parser.add_argument('--tile', type=int, help='Grid points processed per worker task (bounds per-worker memory)', default=128)
+    parser.add_argument('--cube', type=str, help='Path of the cached sky map cube (.npy), reused between runs with the same --model and --freqs', default=None)
+    parser.add_argument('--output', type=str, help='FITS file the sensitivity and Tsky maps are written to', default='galactic-sens-map.fits')
+    parser.add_argument('--load', action='store_true', help='Skip the sweep and plot the map already saved at --output')
+    parser.add_argument('--snr', type=float, help='Signal-to-noise ratio of the sensitivity limit', default=10)
+    parser.add_argument('--aeff', type=float, help='Effective area [m^2]', default=2048)
+    parser.add_argument('--bandwidth', type=float, help='Bandwidth [Hz]', default=3.66e6)
+    parser.add_argument('--tobs', type=float, help='Integration time [s]', default=60*80)
+    args = parser.parse_args()
+
+    if args.load:
+        l, b, tsky, sens = load_map(args.output)
+    else:
+        l = np.arange(0, 360, args.dl)
+        b = np.arange(args.bmin, args.bmax + args.db / 2, args.db)
+        cube_path = args.cube or 'skymap-%s-%s.npy' % (args.model, '-'.join('%g' % freq for freq in args.freqs))
+
+        tsky = sweepGalacticGrid(l, b, args.freqs, skyModels[args.model](freq_unit='MHz'), cube_path, workers=args.workers, tilePoints=args.tile, sampling=args.samples, nhwhm=args.nhwhm)
+        sens = sens_limit(args.snr, tsky, args.aeff, args.bandwidth, args.tobs)
+        save_map(args.output, l, b, tsky, sens)
+        print('Saved %d x %d sensitivity map to %s' % (len(b), len(l), args.output))
+
+    #%%
+    import scienceplots; plt.style.use(['science', 'ieee'])
+
+    # -- all-sky aitoff map --
+    plt.figure()
+    plt.subplot(111, projection='aitoff')
+    wrapped_l = np.deg2rad((l + 180) % 360 - 180)
+    order = np.argsort(wrapped_l)
+    mesh = plt.pcolormesh(wrapped_l[order], np.deg2rad(b), sens[:, order] * 1000, shading='nearest', norm='log')
+    plt.colorbar(mesh, label='Sensitivity Limit (mJy)', orientation='horizontal')
+    plt.grid(True)
+    plt.xlabel('Galactic Longitude (deg)')
+    plt.ylabel('Galactic Latitude (deg)')
+
+    # -- per-longitude curves as slices of the map --
+    plt.figure(figsize=(5, 4))
+    for long, style in zip([0, 60, 120, 180, 240, 300], ['r--', 'b--', 'g--', 'y--', 'm--', 'c--']):
+        lat, curve = longitude_slice(l, b, sens, long)
+        plt.plot(lat, curve*1000, style, label='$l = %d $' % long)
+
+    plt.xlabel('Galactic Latitude (deg)')
+    plt.ylabel('Sensitivity Limit (mJy)')
+    plt.legend(frameon=True)
+    plt.show()
 # %%
@@ -0,0 +1,28 @@
+'''
+Code Purpose: Refresh or check the local IERS/ephemeris bundle used by the scheduling tools (see ilofar_obs.offline)
+Author: Owen A. Johnson
+'''
+
+import argparse
+import sys
+
+from ilofar_obs.offline import BUNDLE_DIR, refresh_bundle, check_bundle
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the local IERS/ephemeris bundle used by the scheduling tools')
+    parser.add_argument('command', choices=['refresh', 'check'], help='refresh downloads a new bundle, check reports how stale it is')
+    parser.add_argument('--dir', type=str, help='Bundle directory (default: $ILOFAR_DATA_DIR or ~/.ilofar-obs-data)', default=BUNDLE_DIR)
+    parser.add_argument('--ephemeris', type=str, help='builtin, or a JPL kernel name such as de432s or de440s (refresh only)', default='builtin')
+    parser.add_argument('--max-age', type=float, help='Exit with status 1 if the last measured IERS value is older than this many days (check only)', default=30)
+    args = parser.parse_args()
+
+    if args.command == 'refresh':
+        manifest = refresh_bundle(args.dir, args.ephemeris)
+        print('Bundle written to %s' % args.dir)
+    else:
+        status = check_bundle(args.dir)
+        print('Bundle in %s fetched %s (%.1f days ago), ephemeris %s' % (args.dir, status['fetched'], status['fetched_age_days'], status['ephemeris']))
+        print('Last measured IERS value %s (%.1f days ago), predictions until %s (%.1f days left)' % (status['last_measured'], status['measured_age_days'], status['predictions_until'], status['prediction_days_left']))
+        if status['measured_age_days'] > args.max_age or status['prediction_days_left'] < 0:
+            print('Bundle is stale, run offline_data.py refresh when the uplink is available.')
+            sys.exit(1)
@@ -1,156 +1,97 @@
 
 '''
-Code Purpose: 
-Author: Owen A. Johnson 
+Code Purpose: Fill the observing schedule with the best catalogue source at each time step (thin CLI over ilofar_obs)
+Author: Owen A. Johnson
 Date: 31/12/2023
 '''
-#%% 
+#%%
 
 import matplotlib.pyplot as plt
 import smplotlib
+import argparse
 # import scienceplots; plt.style.use('science')
 import astropy.units as u
-import numpy as np
-import pandas as pd
 
-from astropy.coordinates import EarthLocation, SkyCoord, solar_system_ephemeris, get_body, AltAz
-from pytz import timezone
+from astropy.coordinates import get_body
 from astropy.time import Time
-from astroplan import Observer
 from astroplan import FixedTarget
 from astroplan.plots import plot_sky
-from LSTfunctions import calculate_lst, read_src
-import matplotlib.dates as mdates
-from tqdm import tqdm 
-from datetime import datetime
+
+from ilofar_obs import (LOCATION, BENCHMARKS, make_observer, observation_times, load_catalogue, catalogue_from_cube,
+                        altaz_tracks, load_visibility_cube, slice_window, add_constraint_args, avoidance_mask,
+                        best_sources, schedule_blocks, schedule_timefmt, setup_offline_data)
 
 # ------------------------------------
 #          - Set up Arguments -
 # ------------------------------------
-plot = False; verbose = True
-
-def find_nearest(array, value):
-    array = np.asarray(array)
-    idx = (np.abs(array - value)).argmin()
-    return idx
-
-def find_changes(iterable):
-    changes = []
-    for i in range(1, len(iterable)):
-        if iterable[i] != iterable[i - 1]:
-            changes.append(i)
-    return changes
-
-def schedule_timefmt(input_string):
-    input_format = "%Y-%m-%d %H:%M:%S.%f"
-
-    dt_object = datetime.strptime(input_string, input_format)
-    output_format = "%Y-%m-%dT%H:%M"
-    output_string = dt_object.strftime(output_format)
-
-    return output_string
+verbose = True
+
+parser = argparse.ArgumentParser(description='Fill the observing schedule with the best source from the catalogue at each time step')
+parser.add_argument('--catalogue', type=str, help='CSV file with Name, RA and DEC (radians) columns', default='2obs.csv')
+parser.add_argument('--cube', type=str, help='Visibility cube made by visibility_cube.py; the window is sliced from it instead of recomputed', default=None)
+parser.add_argument('--rank', choices=['alt', 'sensitivity'], help='Rank sources by altitude or by computed SEFD (Tsky + elevation-projected Aeff)', default='alt')
+parser.add_argument('--tsky-table', type=str, help='Pickle cache of per-source Tsky values, same format as tsky_sefd_LOFAR_ilt.py --list output', default='./tsky_output.pkl')
+parser.add_argument('--freqs', type=float, nargs='+', help='Frequencies [MHz] of the Tsky table used when ranking by sensitivity (same default as tsky_sefd_LOFAR_ilt.py, so its --list pickle is reused). Tinst and Aeff are evaluated with them clipped to the 110-250 MHz HBA Tinst fit range', default=[100, 150, 200])
+parser.add_argument('--ntiles', type=int, help='Number of HBA tiles used for observation', default=None)
+add_constraint_args(parser)
+args = parser.parse_args()
+setup_offline_data(verbose=verbose)
 
 # ------------------------------------
 #          - Set up Observer -
 # ------------------------------------
-
-# Set up Observer, Target and observation time objects.
-longitude = 7.9219 * u.deg
-latitude = 53.0950 * u.deg
-elevation = 72.0 * u.m
-location = EarthLocation.from_geodetic(longitude, latitude, elevation)
-
-observer = Observer(name='I-LOFAR',
-               location=location,
-               pressure=0.615 * u.bar,
-               relative_humidity=0.11,
-               temperature=0 * u.deg_C,
-               description="LOFAR Station IE613")
+observer = make_observer()
 
 obs_window = 31
 observe_time = Time.now()
-observe_times = observe_time + np.linspace(0, obs_window, 1000)*u.hour
-increment = round((60/(obs_window**2/100)/2))
-
-# ------------------------------------
-#          - Benchmark Targets -
-# ------------------------------------
-
-# - Polaris -
-coordinates = SkyCoord('02h31m49.09s', '+89d15m50.8s', frame='icrs')
-polaris = FixedTarget(name='Polaris', coord=coordinates)
-polaris_style = {'color': 'k', 'marker': '*'}
-
-# - Crab Pulsar - 
-coordinates = SkyCoord('05h34m31.93830s', '+22d00m52.1758s', frame='icrs')
-crab = FixedTarget(name='Crab', coord=coordinates)
-crab_style = {'color': 'r'}
-
-# - Sun - 
-with solar_system_ephemeris.set('builtin'):
-    sun_coords = get_body('sun', observe_times, location) 
-sun = FixedTarget(name='Sun', coord=sun_coords)
-sun_style = {'color': 'y'}
+observe_times = observation_times(observe_time, obs_window)
 
 #%%
 # -----------------------------------------------------------
 #          - Altitude and Azimuth Calculations -
 # -----------------------------------------------------------
-src_df = pd.read_csv('2obs.csv')
-src_names = src_df['Name']
-coords = SkyCoord(ra=src_df['RA'], dec=src_df['DEC'], unit=(u.rad, u.rad))
-alt_az_coords = [] 
-
-print('Number of sources in the database: ', len(src_names))
-
-for i in tqdm(range(len(coords))):
-    alt = coords[i].transform_to(AltAz(obstime=observe_times, location=location)).alt.degree
-    az = coords[i].transform_to(AltAz(obstime=observe_times, location=location)).az.degree
-    alt_az_coords.append([[alt, az], src_names[i], coords[i]])
+if args.cube:
+    cube = load_visibility_cube(args.cube)
+    src_df, coords = catalogue_from_cube(cube)
+    observe_times, alt, az = slice_window(cube, observe_time, observe_time + obs_window * u.hour)
+else:
+    src_df, coords = load_catalogue(args.catalogue)
+    alt, az = altaz_tracks(coords, observe_times)
+
+print('Number of sources in the database: ', len(src_df))
+
+# Sun/Moon/A-team separation and altitude floor for every (source, time) slot
+allowed = avoidance_mask(alt, az, observe_times, LOCATION, min_alt=args.min_alt, sun_sep=args.sun_sep,
+                         moon_sep=args.moon_sep, ateam_sep=args.ateam_sep, ateam=args.ateam)
 #%%
-#  - Finding Highest Alt at each Observation time -
-highest_alt = []
-
-for i in range(0, len(observe_times)): # loop through each obs time. 
-    max_alt = 0
-    for j in range(0, len(alt_az_coords)):
-        alt_data = alt_az_coords[j][0][0]
-        if max_alt < alt_data[i]:
-            max_alt = alt_data[i]
-            src_name = alt_az_coords[j][1]
-            src_coord = alt_az_coords[j][2]
-    highest_alt.append([src_name, src_coord, max_alt, observe_times[i]])
-
-
-change_idxs = [0] 
-for i in range(1, len(highest_alt)):
-    if highest_alt[i][1] != highest_alt[i - 1][1]:   
-        change_idxs.append(i)
-change_idxs.append(999)
-len(change_idxs)
+#  - Finding the best source at each Observation time -
+sefd = None
+if args.rank == 'sensitivity':
+    from ilofar_obs.sensitivity import getTskyTable, getSEFDMatrix
+
+    tsky = getTskyTable(src_df['Name'], coords, args.freqs, path=args.tsky_table)
+    sefd = getSEFDMatrix(tsky, alt, args.freqs, nelem=args.ntiles)
+best_idx = best_sources(alt, allowed, sefd)
 
 # ------------------------------------
 #    - Printing Results in Format -
 # ------------------------------------
 
-for i in range(0, len(change_idxs) - 1):
-    # Find matching id in the dataframe
-    name_id = src_df.loc[src_df['Name'] == highest_alt[change_idxs[i]][0]].index[0]
-    print(schedule_timefmt(str(highest_alt[change_idxs[i]][3])), '-', schedule_timefmt(str(highest_alt[change_idxs[i + 1]][3])), ': %s' % src_df['Name'][name_id], "[%s, %s, 'J2000']" % (src_df['RA'][name_id], src_df['DEC'][name_id]))
-    
+for start, end, name_id in schedule_blocks(best_idx):
+    print(schedule_timefmt(observe_times[start]), '-', schedule_timefmt(observe_times[end]), ': %s' % src_df['Name'][name_id], "[%s, %s, 'J2000']" % (src_df['RA'][name_id], src_df['DEC'][name_id]))
+
 #%%
 # ------------------------------------
 #        - Plotting Results -
 # ------------------------------------
-plot_sky(polaris, observer, observe_time, style_kwargs=polaris_style)
-plot_sky(crab, observer, observe_times, style_kwargs=crab_style)
-plot_sky(sun, observer, observe_times, style_kwargs=sun_style)
+polaris = FixedTarget(name='Polaris', coord=BENCHMARKS['Polaris'])
+crab = FixedTarget(name='Crab', coord=BENCHMARKS['Crab'])
+# Ephemeris comes from the offline data bundle (builtin if there is none)
+sun = FixedTarget(name='Sun', coord=get_body('sun', observe_times, LOCATION))
 
-# for i in range(0, len(highest_alt)):
-#     trgt = FixedTarget(name=str(highest_alt[i][0]), coord=highest_alt[i][1])
-#     start_time = int(highest_alt[i][3] - increment); end_time = int(highest_alt[i][3] + increment)
-#     if start_time < 0: start_time = len(observe_time) - abs(start_time)
-#     plot_sky(trgt, observer, observe_times[start_time:end_time], style_kwargs={'s': 10})
+plot_sky(polaris, observer, observe_time, style_kwargs={'color': 'k', 'marker': '*'})
+plot_sky(crab, observer, observe_times, style_kwargs={'color': 'r'})
+plot_sky(sun, observer, observe_times, style_kwargs={'color': 'y'})
 
 ax = plt.gca()
 box = ax.get_position()
@@ -158,4 +99,4 @@ ax.set_position([box.x0, box.y0, box.width * 2, box.height * 2])
 
 plt.legend(loc='center left', bbox_to_anchor=(1.25, 0.5))
 plt.tight_layout()
-plt.show()
\ No newline at end of file
+plt.show()
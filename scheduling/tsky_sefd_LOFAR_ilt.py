@@ -1,202 +1,16 @@
-#%%
+'''
+Command line front end for the sky temperature / SEFD calculations in ilofar_obs.sensitivity.
+'''
 from astropy.coordinates import SkyCoord
-from scipy import optimize as opt
 import argparse
-import astropy.units as u
 import matplotlib.pyplot as plt
 import numpy as np
 import pickle
-import pygdsm
 import scienceplots
 plt.style.use(['science', 'ieee'])
 
-# Number of active tiles during observations
-N_TILES = 94
-
-# Patch in helpers from tsky_orig.py
-stationDiameter = 56.5 # metres
-scaleFactor = 1.02 # van Haarlem et al. Tab. B1
-c = 299792458 # m/s
-rad2Deg = 57.2958 # deg/rad
-
-hwhm = lambda freq: rad2Deg * scaleFactor * (c / (freq * 1e6)) / stationDiameter / 2
-gauss2d = lambda sigma, x, y: np.exp(-(np.square(x)/(2 * sigma * sigma) + np.square(y) / (2 * sigma * sigma)))
-
-def powerl(x, a ,b):
-	return a * np.power(x, b)
-
-# Kondratiev et al.
-def lofar_tinst_range(band = 'HBA', freqs = None, dv = 0.):
-	"""
-	calculates the LOFAR HBA/LBA average Tinst using polynomial expressions 
-	for Tinst from fit to Wijnholds (2011) between frequencies f1 and f2 (in MHz).
-	Return value is Tinst in Kelvins.
-	If frequency array 'freqs' is given, then average Tinst will be calculated for each
-	frequency range f0-f1, f1-f2, f2-f2 of the array and returned value is list of average Tinst's.
-	Size of the returned array is smaller by 1 than the size of the input freqs array
-	Each pair of frequencies should be either above 100 MHz or below 100 MHz
-	"""
-
-	if type(freqs) in [float, int]:
-		freqs = [(freqs - dv, freqs + dv)]
-
-	if band.upper() == 'HBA':
-		flow=110
-		fhigh=250
-		fstep=5
-		# polynomial coefficients
-		T_inst_poly = [6.64031379234e-08, -6.27815750717e-05, 0.0246844426766, -5.16281033712, 605.474082663, -37730.3913315, 975867.990312]
-	else:
-		print(f"Unknown band {band.upper()}. Exiting.")
-		return None
-	dpoly = len(T_inst_poly)
-
-	tinsts=[]
-	for flower, fupper in freqs:
-		tot = 0
-		df = fupper - flower
-		for ii in range(101):
-			freq = flower + ii*(df)/100.
-			tinst = 0.0
-			for jj in range(dpoly): 
-				tinst += T_inst_poly[jj]*(freq)**(dpoly-jj-1)
-			tot += tinst
-		tot /= 100.
-		tinsts.append(tot)
-
-	return tinsts
-
-# 2 tiles out of action -> 94
-# Kondratiev et al.
-def get_lofar_aeff_max(freqs, nelem=N_TILES, SEPTON = False):
-	"""
-	Calculate the Aeff using given frequency and EL
-	"""
-
-	wavelen = 300.0 / np.array(freqs)
-	# HBA
-	if np.max(freqs) >= 100.:
-		aeff = nelem * (16. if not SEPTON else 1.) * np.minimum((wavelen * wavelen)/3., 1.5625)
-	# LBA (LBA_OUTER)
-	else:
-		aeff = nelem * (wavelen * wavelen)/3.
-	return aeff
-
-def calculateBrightness(snr, aeff, beamcorrection, tsys, tsky, tobs, bandwidth = 5, rfiflagged = 0.):
-	return snr * (1 * 2 * 1380 *(tsys + tsky) / (aeff / beamcorrection)) / np.sqrt(2 * bandwidth * 1e6 * (1 - rfiflagged) * tobs)
-
-
-def getCoordinateGrid(centre, frequencies, sampling = 64, nfwhm = 2):
-	grids = {frequency: (np.meshgrid(np.linspace(-nfwhm * hwhm(frequency), nfwhm * hwhm(frequency), sampling), np.linspace(-nfwhm * hwhm(frequency), nfwhm * hwhm(frequency), sampling))) for frequency in frequencies}
-
-	centre = centre.galactic
-
-	coords = {}
-	for frequency, (gridL, gridB) in grids.items():
-		coords[frequency] = centre.spherical_offsets_by(gridL * u.deg, gridB * u.deg)
-
-	return grids, coords
-
-def getSkyRegion(model, coords):
-	regions = {}
-
-	for frequency, coord in coords.items():
-		regions[frequency] = model.get_sky_temperature(coord, frequency)
-
-	return regions
-
-def applyBeamGuassian(grids, temps, plot = False):
-	gaussians = {frequency: gauss2d(hwhm(frequency), grid[0], grid[1]) for frequency, grid in grids.items()}
-
-
-	convTemp = {}
-	for (frequency, gaussian), temp, grid in zip(gaussians.items(), temps.values(), grids.values()):
-		convTemp[frequency] = np.sum(np.multiply(temp, gaussian)) / np.sum(gaussian)
-
-		if plot:
-			plt.title(f"Raw Sky Temperatures @ {frequency:.3g} MHz")
-			plt.xlabel("l [deg]")
-			plt.ylabel("b [deg]")
-			plt.pcolormesh(grid[0], grid[1], temp)
-			plt.colorbar(label = "Temperature [K]")
-			plt.scatter(0, 0, alpha = 0.2)
-			plt.savefig(f"plots/raw_{frequency:.3g}.png")
-			plt.close()
-
-			# plt.figure()
-			plt.title(f"Beam-Convolved Sky Temperatures @ {frequency:.3g} MHz ({convTemp[frequency]:.3g}K)", fontsize = 8)
-			plt.xlabel("l [deg]")
-			plt.ylabel("b [deg]")
-			plt.pcolormesh(grid[0], grid[1], np.multiply(temp, gaussian))
-			plt.colorbar(label = "Contributed Temperature [K]")
-			plt.scatter(0, 0, alpha = 0.2)
-			plt.savefig(f"plots/conv_{frequency:.3g}.png")
-			plt.close()
-			
-
-
-
-	pars, cov = opt.curve_fit(powerl, np.fromiter(convTemp.keys(), dtype = float), np.fromiter(convTemp.values(), dtype = float))
-
-	return pars, convTemp
-
-
-def getSourceTsky(source, frequencies, model = pygdsm.LowFrequencySkyModel(freq_unit = 'MHz'), sampling = 64, nhwhm = 2, plot = False):
-	model.generate(frequencies)
-
-	referenceValues = {frequency: model.get_sky_temperature(source, frequency) for frequency in frequencies}
-
-	grids, coords = getCoordinateGrid(source, frequencies, sampling, nhwhm)
-	temps = getSkyRegion(model, coords)
-	pars, convTemp = applyBeamGuassian(grids, temps, plot = plot)
-
-
-	return pars, convTemp, referenceValues
-
-def getSEFD(tskys, bandwidth = 1, tobs = 1e-3, rfiFraction = 0.):
-	sefd = {}
-	for freq, tsky in tskys.items():
-		sefd[freq] = calculateBrightness(1., aeff = get_lofar_aeff_max(freq), beamcorrection = 1.0, tsys = lofar_tinst_range('HBA', freqs = freq, dv = bandwidth), tsky = tsky, tobs = tobs,  bandwidth = bandwidth, rfiflagged = rfiFraction).item()
-	return sefd
-
-def getSEFD_bandavg(args, frequencies, vsamp = 5.):
-	width = 1e-3
-	freqs = np.arange(frequencies[0] + vsamp / 2, frequencies[1] - vsamp / 2 + vsamp, vsamp)[:, np.newaxis]
-	bandFreqs = np.hstack([freqs, freqs])
-	bandFreqs[:, 0] -= vsamp / 2
-	bandFreqs[:, 1] += vsamp / 2
-
-
-	aeffAvg = np.mean(get_lofar_aeff_max(freqs))
-	tsysAvg = np.mean(lofar_tinst_range('HBA', bandFreqs))
-
-	#print(f"aeffAvg: {get_lofar_aeff_max(bandFreqs)} -> {aeffAvg}")
-	#print(f"tsysAvg: {lofar_tinst_range('HBA', bandFreqs)} -> {tsysAvg}")
-
-	source = SkyCoord(args.ra, args.dec, unit = 'hourangle, degree')
-	res = getSourceTsky(source, freqs[:, 0].tolist(), model = skyModels[args.model](freq_unit = 'MHz'), sampling = args.samples, nhwhm = args.nhwhm, plot = args.plot)
-	tskyAvg = np.mean(list(res[1].values()))
-
-	#print(f"tskyAvg: {list(res[1].values())} -> {tskyAvg}")
-
-	sefd = calculateBrightness(1., aeff = aeffAvg, beamcorrection = 1.0, tsys = tsysAvg, tsky = tskyAvg, tobs = width, bandwidth = frequencies[1] - frequencies[0], rfiflagged = args.rfi_frac)
-	print(f"SEFD {np.abs(np.diff(frequencies)).items()}MHz {width / 1e-3}ms: {sefd:.3g} [Jy]")
-
-	return sefd
-
-def getSensitivityLimits(sefd, snr, width_ms, bandwidth_MHz):
-	sensitivity = {}
-	for freq, sefdv in sefd.items():
-		sensitivity[freq] = sefdv * snr / np.sqrt(width_ms * bandwidth_MHz)
-	return sensitivity
-
-
-skyModels = {
-	'LFSS': pygdsm.LowFrequencySkyModel,
-	'GSM2008': pygdsm.GlobalSkyModel,
-	'GSM2016': pygdsm.GlobalSkyModel16,
-	'HASLAM': pygdsm.HaslamSkyModel,
-}
+from ilofar_obs.sensitivity import (N_TILES, AEFF_COS_POWER, SUBBAND_WIDTH, RCU_MODE_OFFSETS, skyModels, calculateBrightness,
+	getSourceTsky, getSEFD, getSEFDTrack, getSEFD_bandavg, getSEFD_channels, getSensitivityLimits, parseSubbands, subbandToFreq)
 
 if __name__ == '__main__':
 
@@ -226,11 +40,16 @@ if __name__ == '__main__':
 
 
 
+	parser.add_argument("--subbands", default = None, type = str, help = "Compute a per-subband SEFD table for these subbands, e.g. \"12:499\" or \"51:100,200\" (ranges inclusive).")
+	parser.add_argument("--rcumode", default = 5, type = int, choices = sorted(RCU_MODE_OFFSETS), help = "HBA RCU mode used to map subbands to frequencies.")
+	parser.add_argument("--batch", default = 32, type = int, help = "Number of subbands to generate the sky model for at once (bounds memory use).")
+	parser.add_argument("--sefd_table", default = None, type = str, help = "Path to save the per-subband SEFD table to.")
+
 	parser.add_argument("--ntiles", default = None, type = int, help = f"Number of HBA tiles used for observation (default: {N_TILES}).")
+	parser.add_argument("--cos_power", default = AEFF_COS_POWER, type = float, help = f"Exponent n of the cos^n(zenith) Aeff projection (default: {AEFF_COS_POWER}).")
+	parser.add_argument("--alt", default = None, type = float, help = "Source elevation [deg] at which to evaluate the SEFD. Defaults to the zenith Aeff.")
 
 	args = parser.parse_args()
-	if args.ntiles is not None:
-		N_TILES = args.ntiles
 
 	if args.list:
 		sources = {}
@@ -248,10 +67,30 @@ if __name__ == '__main__':
 		with open(args.output, 'wb') as ref:
 			pickle.dump(results, ref)
 		exit()
+	elif args.subbands:
+		source = SkyCoord(args.ra, args.dec, unit = 'hourangle, degree')
+		subbands = parseSubbands(args.subbands)
+		freqs = subbandToFreq(subbands, args.rcumode)
+
+		tsky, tinst, aeff, sefd = getSEFD_channels(source, freqs, skyModels[args.model](freq_unit = 'MHz'), tobs = 1e-3, rfiFraction = args.rfi_frac, sampling = args.samples, nhwhm = args.nhwhm, batch = args.batch, nelem = args.ntiles)
+
+		print(f"Subband\tFreq [MHz]\tTsky [K]\tTinst [K]\tAeff [m^2]\tSEFD [Jy]")
+		for row in zip(subbands, freqs, tsky, tinst, aeff, sefd):
+			print("{:d}\t{:.4f}\t{:.5g}\t\t{:.5g}\t\t{:.5g}\t\t{:.5g}".format(*row))
+
+		bandwidth = len(freqs) * SUBBAND_WIDTH
+		sefdAvg = calculateBrightness(1., aeff = np.mean(aeff), beamcorrection = 1.0, tsys = np.mean(tinst), tsky = np.mean(tsky), tobs = 1e-3, bandwidth = bandwidth, rfiflagged = args.rfi_frac)
+		print(f"\nBand average ({len(freqs)} subbands, {bandwidth:.4g}MHz): Tsky {np.mean(tsky):.5g}K, Tinst {np.mean(tinst):.5g}K, SEFD {sefdAvg:.3g} [Jy]")
+
+		if args.sefd_table:
+			np.savetxt(args.sefd_table, np.column_stack([subbands, freqs, tsky, tinst, aeff, sefd]), header = "subband freq_MHz tsky_K tinst_K aeff_m2 sefd_Jy")
 	else:
 		if args.sefd_bandavg:
 			freqs = [110, 185]
-			value = getSEFD_bandavg(args, freqs)
+			width = 1e-3
+			source = SkyCoord(args.ra, args.dec, unit = 'hourangle, degree')
+			value = getSEFD_bandavg(source, freqs, model = skyModels[args.model](freq_unit = 'MHz'), tobs = width, rfiFraction = args.rfi_frac, sampling = args.samples, nhwhm = args.nhwhm, nelem = args.ntiles, plot = args.plot)
+			print(f"SEFD {np.abs(np.diff(freqs)).item()}MHz {width / 1e-3}ms: {value:.3g} [Jy]")
 			exit()
 
 		source = SkyCoord(args.ra, args.dec, unit = 'hourangle, degree')
@@ -268,7 +107,10 @@ if __name__ == '__main__':
 		print()
 
 		if args.sefd or args.sensitivity_snr:
-			sefd = getSEFD(res[1], rfiFraction = args.rfi_frac)
+			if args.alt is None:
+				sefd = getSEFD(res[1], rfiFraction = args.rfi_frac, nelem = args.ntiles)
+			else:
+				sefd = {freq: val.item() for freq, val in getSEFDTrack(res[1], [args.alt], rfiFraction = args.rfi_frac, nelem = args.ntiles, cosPower = args.cos_power).items()}
 		if args.sefd:
 			print("\n\nFreq [MHz]:\tSEFD [Jy MHz ms]")
 			for freq, val in sefd.items():
@@ -0,0 +1,27 @@
+'''
+Code Purpose: Precompute a multi-week alt/az visibility cube for a source catalogue (see ilofar_obs.visibility)
+Author: Owen A. Johnson
+'''
+
+import argparse
+
+from astropy.time import Time
+
+from ilofar_obs import build_visibility_cube, load_catalogue, setup_offline_data
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute a compact alt/az visibility cube for a source catalogue')
+    parser.add_argument('--catalogue', type=str, help='CSV file with Name, RA and DEC (radians) columns', default='2obs.csv')
+    parser.add_argument('--output', type=str, help='Directory the cube is written to', default='visibility-cube')
+    parser.add_argument('--start', type=str, help='Start time in form YYYY-MM-DD HH:MM:SS (default: now)', default=None)
+    parser.add_argument('--days', type=float, help='Length of the cube in days', default=28)
+    parser.add_argument('--cadence', type=float, help='Sample spacing in minutes', default=2)
+    parser.add_argument('--chunk', type=int, help='Time samples transformed per batch', default=1440)
+    args = parser.parse_args()
+    setup_offline_data(verbose=True)
+
+    src_df, coords = load_catalogue(args.catalogue)
+    start = Time(args.start) if args.start else Time.now()
+
+    build_visibility_cube(args.output, src_df['Name'], coords, start, args.days, args.cadence, chunk=args.chunk)
+    print('Wrote %d sources x %.1f days at %g min cadence to %s' % (len(coords), args.days, args.cadence, args.output))
@@ -0,0 +1,136 @@
+'''
+Code Purpose: Long-running service that keeps the catalogue's visibility windows in memory and announces when sources rise above / set below their observing threshold for IE613
+Author: Owen A. Johnson
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+
+import astropy.units as u
+
+from ilofar_obs import VisibilityWindows, load_catalogue, catalogue_from_cube, load_visibility_cube, setup_offline_data
+
+# ------------------------------------
+#          - Set up Arguments -
+# ------------------------------------
+parser = argparse.ArgumentParser(description='Emit JSON events when catalogue sources cross their observing thresholds, and answer "now"/"next" queries on a local socket')
+parser.add_argument('--catalogue', type=str, help='CSV file with Name, RA and DEC (radians) columns', default='2obs.csv')
+parser.add_argument('--cube', type=str, help='Visibility cube made by visibility_cube.py to read tracks from instead of computing them', default=None)
+parser.add_argument('--horizon', type=float, help='Hours of visibility kept ahead of the current time', default=31)
+parser.add_argument('--cadence', type=float, help='Sample spacing in minutes', default=1)
+parser.add_argument('--min-alt', type=float, help='Altitude floor [deg]: thresholds never go below it, so low or never-rising sources are not reported while below the horizon', default=0.)
+parser.add_argument('--refresh', type=float, help='Minutes between incremental refreshes of the windows', default=30)
+parser.add_argument('--socket', type=str, help='Unix socket path for queries and event subscriptions (disabled if not given)', default=None)
+args = parser.parse_args()
+setup_offline_data()
+
+# Unix epoch as an MJD, used to turn time.time() into MJD without building a Time object
+UNIX_EPOCH_MJD = 40587.0
+
+def mjd_now():
+    return time.time() / 86400. + UNIX_EPOCH_MJD
+
+# ------------------------------------
+#        - Event Loop -
+# ------------------------------------
+
+async def emit_events(windows, subscribers):
+    loop = asyncio.get_running_loop()
+    last = mjd_now()
+    while True:
+        now = mjd_now()
+        if now >= windows.next_refresh:
+            # Transforms run in a worker thread so queries keep being answered meanwhile
+            new_mjd, new_alt = await loop.run_in_executor(None, windows.extension, now)
+            windows.apply(now, new_mjd, new_alt)
+
+        for event in windows.events_between(last, now):
+            line = json.dumps(event)
+            print(line, flush=True)
+            for writer in list(subscribers):
+                writer.write((line + '\n').encode())
+        last = now
+
+        wait = min(windows.next_event_mjd(now), windows.next_refresh) - now
+        await asyncio.sleep(max(wait * 86400., 0.5))
+
+async def handle_client(reader, writer, windows, subscribers):
+    try:
+        while line := await reader.readline():
+            command = line.decode().split()
+            if not command:
+                continue
+            if command[0] == 'now':
+                reply = windows.up_now(mjd_now())
+            elif command[0] == 'next':
+                try:
+                    n = int(command[1]) if len(command) > 1 else 5
+                except ValueError:
+                    n = None
+                if n is None:
+                    reply = {'error': 'bad count %s, expected next [n] with n an integer' % command[1]}
+                else:
+                    reply = windows.upcoming(mjd_now(), n)
+            elif command[0] == 'subscribe':
+                subscribers.add(writer)
+                continue
+            else:
+                reply = {'error': 'unknown command %s, expected now, next [n] or subscribe' % command[0]}
+            writer.write((json.dumps(reply) + '\n').encode())
+            await writer.drain()
+    finally:
+        subscribers.discard(writer)
+        writer.close()
+
+async def remove_stale_socket(path):
+    '''Unlink a socket file left behind by a crashed run, refusing to start if another alerter still answers on it.'''
+    if not os.path.exists(path):
+        return
+    try:
+        _, writer = await asyncio.open_unix_connection(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(path)
+        return
+    writer.close()
+    raise SystemExit('Another window-alerter is already listening on %s' % path)
+
+async def main():
+    cube = None
+    if args.cube:
+        cube = load_visibility_cube(args.cube)
+        src_df, coords = catalogue_from_cube(cube)
+        cube_end = cube['start'] + (cube['n_times'] - 1) * cube['cadence_min'] * u.min
+        print('Visibility cube covers %s to %s' % (cube['start'].isot[:19], cube_end.isot[:19]), file=sys.stderr)
+        if cube_end.mjd < mjd_now() + args.horizon / 24.:
+            print('Tracks past %s are computed on the fly; rebuild the cube with visibility_cube.py to extend it' % cube_end.isot[:19], file=sys.stderr)
+    else:
+        src_df, coords = load_catalogue(args.catalogue)
+
+    windows = VisibilityWindows(src_df['Name'], coords, horizon=args.horizon, cadence=args.cadence, refresh=args.refresh, cube=cube, min_alt=args.min_alt)
+    now = mjd_now()
+    windows.apply(now, *windows.extension(now))
+
+    subscribers = set()
+    if args.socket:
+        await remove_stale_socket(args.socket)
+        server = await asyncio.start_unix_server(lambda r, w: handle_client(r, w, windows, subscribers), path=args.socket)
+    # Shut down cleanly (and remove the socket) on SIGTERM as well as Ctrl-C
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    try:
+        await emit_events(windows, subscribers)
+    finally:
+        if args.socket:
+            server.close()
+            if os.path.exists(args.socket):
+                os.unlink(args.socket)
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
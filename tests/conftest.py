@@ -0,0 +1,8 @@
+import pytest
+
+from ilofar_obs import setup_offline_data
+
+@pytest.fixture(autouse=True, scope='session')
+def offline_astropy(tmp_path_factory):
+    '''No IERS downloads during the tests: bundled IERS-A table and builtin ephemeris.'''
+    setup_offline_data(bundle_dir=str(tmp_path_factory.mktemp('no-bundle')))
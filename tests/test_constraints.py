@@ -0,0 +1,18 @@
+import astropy.units as u
+import numpy as np
+
+from astropy.coordinates import SkyCoord
+
+from ilofar_obs.constraints import angular_separation
+
+def test_angular_separation_matches_skycoord():
+    rng = np.random.default_rng(1)
+    alt1, alt2 = rng.uniform(-90, 90, (2, 200))
+    az1, az2 = rng.uniform(0, 360, (2, 200))
+    # Alt/az are just another spherical frame here, so compare against lon/lat separations
+    ref = SkyCoord(az1 * u.deg, alt1 * u.deg).separation(SkyCoord(az2 * u.deg, alt2 * u.deg)).deg
+    assert np.allclose(angular_separation(alt1, az1, alt2, az2), ref, atol=1e-8)
+
+def test_angular_separation_broadcasts():
+    sep = angular_separation(np.zeros((3, 1)), np.array([[0.], [90.], [180.]]), np.zeros((1, 2)), np.array([[0., 90.]]))
+    assert np.allclose(sep, [[0., 90.], [90., 0.], [180., 90.]])
@@ -0,0 +1,37 @@
+import numpy as np
+
+from astropy.io import fits
+from astropy.wcs import WCS
+
+from ilofar_obs.galactic import save_map, load_map, longitude_slice
+
+def make_map(path):
+    l = np.arange(0, 360, 5.)
+    b = np.arange(-90, 90 + 1.25, 2.5)
+    tsky = np.add.outer(b, l)
+    sens = tsky * 1e-3
+    save_map(str(path), l, b, tsky, sens)
+    return l, b, tsky, sens
+
+def test_map_round_trip(tmp_path):
+    l, b, tsky, sens = make_map(tmp_path / 'map.fits')
+    l2, b2, tsky2, sens2 = load_map(str(tmp_path / 'map.fits'))
+    assert np.allclose(l2, l) and np.allclose(b2, b)
+    assert np.array_equal(tsky2, tsky) and np.array_equal(sens2, sens)
+
+def test_map_wcs_positions(tmp_path):
+    l, b, _, _ = make_map(tmp_path / 'map.fits')
+    wcs = WCS(fits.getheader(str(tmp_path / 'map.fits')))
+    cols, rows = np.meshgrid(np.arange(len(l)), np.arange(len(b)))
+    lon, lat = wcs.pixel_to_world_values(cols, rows)
+    assert np.allclose(lat, b[rows])
+    # Longitude is undefined at the poles
+    off_pole = np.abs(b[rows]) < 90
+    assert np.allclose(lon[off_pole] % 360, l[cols][off_pole])
+
+def test_longitude_slice_wraps():
+    l = np.arange(0, 360, 5.)
+    b = np.arange(-10, 11, 5.)
+    sens = np.add.outer(b, l)
+    lat, curve = longitude_slice(l, b, sens, 359, bmin=-5, bmax=5)
+    assert np.array_equal(lat, [-5, 0, 5]) and np.array_equal(curve, [-5, 0, 5])
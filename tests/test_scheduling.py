@@ -0,0 +1,31 @@
+import numpy as np
+
+from astropy.time import Time
+
+from ilofar_obs import best_sources, schedule_blocks, schedule_timefmt
+
+def test_best_sources_by_alt_and_sefd():
+    alt = np.array([[10., 50., 20.], [30., 40., 60.]])
+    assert list(best_sources(alt)) == [1, 0, 1]
+    sefd = np.array([[1., 5., 1.], [2., 1., 3.]])
+    assert list(best_sources(alt, sefd=sefd)) == [0, 1, 0]
+
+def test_best_sources_marks_empty_slots():
+    alt = np.array([[10., 50., 20.], [30., 40., 60.]])
+    allowed = np.array([[True, False, False], [False, False, True]])
+    assert list(best_sources(alt, allowed)) == [0, -1, 1]
+
+def test_schedule_blocks_runs():
+    assert [tuple(map(int, block)) for block in schedule_blocks(np.array([2, 2, 0, 0, 0, 1]))] == [(0, 2, 2), (2, 5, 0)]
+
+def test_schedule_blocks_skips_gaps():
+    assert [tuple(map(int, block)) for block in schedule_blocks(np.array([0, 0, -1, -1, 1, 1]))] == [(0, 2, 0), (4, 5, 1)]
+
+def test_schedule_blocks_last_sample_starts_run():
+    # No zero-length (n-1, n-1) block when the last sample changes source
+    assert [tuple(map(int, block)) for block in schedule_blocks(np.array([0, 0, 1, 1, 2]))] == [(0, 2, 0), (2, 4, 1)]
+    assert schedule_blocks(np.array([3])) == []
+
+def test_schedule_timefmt_any_format():
+    for time in (Time('2026-06-21 13:45:59.9'), Time('2026-06-21T13:45:59.9', format='isot'), '2026-06-21 13:45:59.9'):
+        assert schedule_timefmt(time) == '2026-06-21T13:45'
@@ -0,0 +1,26 @@
+import astropy.units as u
+import numpy as np
+import pytest
+
+from astropy.coordinates import SkyCoord
+
+# Needs the optional sensitivity extra (pygdsm, healpy, scipy)
+sensitivity = pytest.importorskip('ilofar_obs.sensitivity')
+
+def test_spherical_offsets_match_astropy():
+    lon = np.array([0., 45., 200., 359.])
+    lat = np.array([0., 60., -30., 85.])
+    dLon, dLat = np.meshgrid(np.linspace(-3, 3, 5), np.linspace(-3, 3, 5))
+    for lon0, lat0 in zip(lon, lat):
+        ref = SkyCoord(lon0 * u.deg, lat0 * u.deg, frame='galactic').spherical_offsets_by(dLon * u.deg, dLat * u.deg)
+        l, b = sensitivity.sphericalOffsets(lon0, lat0, dLon, dLat)
+        assert np.allclose(b, ref.b.deg, atol=1e-8)
+        assert np.allclose((l - ref.l.deg + 180) % 360 - 180, 0, atol=1e-8)
+
+def test_subband_to_freq():
+    assert np.allclose(sensitivity.subbandToFreq([0, 512], rcuMode=5), [100., 200.])
+    assert np.allclose(sensitivity.subbandToFreq([256], rcuMode=7), [250.])
+
+def test_parse_subbands():
+    assert list(sensitivity.parseSubbands('12:14')) == [12, 13, 14]
+    assert list(sensitivity.parseSubbands('51:52,200,300:301')) == [51, 52, 200, 300, 301]
@@ -0,0 +1,48 @@
+import re
+
+import astropy.units as u
+import numpy as np
+
+from astropy.coordinates import SkyCoord
+from astropy.time import Time
+
+from ilofar_obs import (altaz_tracks, build_visibility_cube, load_visibility_cube, slice_window,
+                        best_sources, schedule_blocks, schedule_timefmt)
+
+NAMES = ['a', 'b', 'c']
+COORDS = SkyCoord(ra=[0.5, 1.5, 3.0], dec=[0.3, 0.9, -0.2], unit='rad')
+START = Time('2026-06-21 00:00:00')
+
+def make_cube(path):
+    build_visibility_cube(str(path), NAMES, COORDS, START, 0.25, 10)
+    return load_visibility_cube(str(path))
+
+def test_cube_slice_matches_tracks(tmp_path):
+    cube = make_cube(tmp_path)
+    times, alt, az = slice_window(cube, START + 1 * u.hour, START + 3 * u.hour)
+    assert len(times) == 13
+    alt_ref, az_ref = altaz_tracks(COORDS, times)
+    assert np.max(np.abs(alt - alt_ref)) <= 0.005 + 1e-4
+    assert np.max(np.abs((az - az_ref + 180) % 360 - 180)) <= 0.005 + 1e-4
+
+def test_schedule_from_cube(tmp_path):
+    # Cube times carry the isot format; the schedule printout must not depend on it
+    cube = make_cube(tmp_path)
+    times, alt, az = slice_window(cube, START, START + 6 * u.hour)
+    blocks = schedule_blocks(best_sources(alt))
+    assert blocks
+    for start, end, _ in blocks:
+        for stamp in (schedule_timefmt(times[start]), schedule_timefmt(times[end])):
+            assert re.fullmatch(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}', stamp)
+    assert schedule_timefmt(times[0]) == '2026-06-21T00:00'
+
+def test_quantize_round_trip():
+    from ilofar_obs.visibility import quantize_altaz, dequantize_altaz
+
+    alt = np.array([-90., -0.004, 0., 12.345, 89.996, 90.])
+    az = np.array([0., 0.004, 179.995, 180., 359.99, 359.994])
+    alt_q, az_q = quantize_altaz(alt, az)
+    assert alt_q.dtype == np.int16 and az_q.dtype == np.int16
+    alt2, az2 = dequantize_altaz(alt_q, az_q)
+    assert np.max(np.abs(alt2 - alt)) <= 0.005 + 1e-5
+    assert np.max(np.abs(az2 - az)) <= 0.005 + 1e-5
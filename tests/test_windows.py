@@ -0,0 +1,53 @@
+import numpy as np
+
+from astropy.coordinates import SkyCoord
+from astropy.time import Time
+
+from ilofar_obs import VisibilityWindows
+
+NOW = Time('2026-06-21 00:00:00').mjd
+
+def test_never_rising_source_is_never_up():
+    # Dec -60 never rises at IE613, dec -33 peaks a few degrees up, dec +60 is high
+    coords = SkyCoord(ra=[1., 1., 1.], dec=[-60., -33., 60.], unit=('rad', 'deg'))
+    windows = VisibilityWindows(['never', 'low', 'high'], coords, horizon=31, cadence=10)
+    windows.apply(NOW, *windows.extension(NOW))
+
+    assert windows.peak[0] < 0 and 0 < windows.peak[1] < 10
+    assert np.all(windows.threshold >= 0)
+    assert not np.any(windows.above[0])
+    assert not np.any(windows.event_src == 0)
+    assert np.all(windows.alt[windows.above] > 0)
+    for i in range(len(windows.mjd)):
+        assert 'never' not in [up['source'] for up in windows.up_now(windows.mjd[i])]
+    assert any(event['source'] == 'high' for event in windows.upcoming(NOW, 10))
+
+from ilofar_obs import observing_window, transit_windows, mask_intervals
+
+def test_observing_window_30_deg_rule():
+    alt = np.array([10., 25., 35., 60., 40., 29., 5.])
+    assert observing_window(alt) == (3, 1, 5, 30.)
+
+def test_observing_window_low_peak_and_open_edges():
+    alt = np.array([22., 24., 25., 20., 14.])
+    assert observing_window(alt) == (2, None, 4, 15.)
+
+def test_transit_windows_keeps_windows_across_chunks():
+    # Three transits a "day" (24 samples) apart, offset so windows straddle multiples of 24
+    t = np.arange(72)
+    alt = 40. * np.cos(2 * np.pi * (t - 22) / 24) + 20.
+    windows = transit_windows(alt)
+    peaks = [int(window[2]) for window in windows]
+    assert peaks == [0, 22, 46, 70]
+    for start, end, peak, rise, set_, threshold in windows:
+        assert threshold == 30.
+        if peak in (22, 46):
+            assert rise is not None and set_ is not None
+            assert np.all(alt[rise:set_ + 1] > threshold)
+            assert alt[rise - 1] <= threshold and alt[set_ + 1] <= threshold
+    # The last window is still open at the end of the track
+    assert windows[-1][4] is None
+
+def test_mask_intervals():
+    assert [tuple(map(int, run)) for run in mask_intervals([1, 1, 0, 0, 1, 0, 1])] == [(0, 2), (4, 5), (6, 7)]
+    assert mask_intervals(np.zeros(4, bool)) == []